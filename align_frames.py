@@ -0,0 +1,163 @@
+import os
+import csv
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from analysis import read_header, load_session
+from clock_sync import TriggerClock
+from count_frames import count_frames, count_frames_exact, VIDEO_EXTENSIONS
+
+RECORDING_EXTENSIONS = ('.csv', '.session', '.archive')
+
+
+def estimate_freq(records):
+    # GUI recordings carry no frequency, take it from the median positive sample interval
+    periods = np.diff(records['timestamp_ns'])
+    periods = periods[periods > 0]
+    return max(1, int(round(1e9 / np.median(periods)))) if len(periods) else None
+
+
+def trigger_indices(records, freq=None):
+    # Trigger index of every sample and where it came from. The counter is the trigger
+    # index since the readers fit the trigger clock, so a counter jump of k means k - 1
+    # triggers whose samples never arrived. Older recordings counted received lines, so
+    # their counter never jumps; for those the sample times are run through the same
+    # trigger clock fit, which finds the lines lost on the way from the time they left.
+    counters = records['counter'].astype(np.int64)
+    steps = np.maximum(np.diff(counters, prepend=counters[:1]), 1)
+    if len(steps):
+        steps[0] = 0
+    if (steps > 1).any() or len(records) < 2:
+        return np.cumsum(steps), 'counter'
+    freq = freq or estimate_freq(records)
+    if not freq:
+        return np.cumsum(steps), 'counter'
+    _, indices = TriggerClock(freq).update_many(records['timestamp_ns'])
+    return np.asarray(indices, dtype=np.int64) - indices[0], 'timestamps'
+
+
+def align(records, frame_count, freq=None):
+    # Each trigger is one camera frame. Triggers whose samples never arrived get
+    # positions interpolated from their neighbours.
+    trigger, source = trigger_indices(records, freq)
+    n_triggers = int(trigger[-1]) + 1 if len(trigger) else 0
+
+    n_frames = n_triggers if frame_count is None else frame_count
+    frames = np.arange(n_frames)
+    sample = np.full(n_frames, -1, dtype=np.int64)
+    covered = trigger < n_frames
+    sample[trigger[covered]] = np.flatnonzero(covered)
+
+    # Positions and times for every frame, interpolated across missing samples
+    known = sample >= 0
+    position = np.full(n_frames, np.nan)
+    timestamp_ns = np.full(n_frames, -1, dtype=np.int64)
+    if known.any():
+        position = np.interp(frames, frames[known], records['position'][sample[known]].astype(np.float64))
+        t0 = records['timestamp_ns'][0]
+        rel = np.interp(frames, frames[known], (records['timestamp_ns'][sample[known]] - t0).astype(np.float64))
+        timestamp_ns = t0 + rel.astype(np.int64)
+        # Frames past the last received trigger have nothing to interpolate from
+        beyond = frames > frames[known][-1]
+        position[beyond] = np.nan
+        timestamp_ns[beyond] = -1
+
+    table = np.empty(n_frames, dtype=[('frame', '<i8'), ('sample', '<i8'), ('timestamp_ns', '<i8'),
+                                      ('position', '<f8'), ('interpolated', '?')])
+    table['frame'] = frames
+    table['sample'] = sample
+    table['timestamp_ns'] = timestamp_ns
+    table['position'] = position
+    table['interpolated'] = ~known
+
+    report = {
+        'samples': len(records),
+        'frames': n_frames,
+        'triggers': n_triggers,
+        'dropped_samples': int(n_triggers - len(records)),
+        'drops_from': source,
+        # More triggers than frames means the camera missed some, more frames than triggers means extra frames
+        'missing_frames': max(0, n_triggers - n_frames),
+        'extra_frames': max(0, n_frames - n_triggers),
+    }
+    return table, report
+
+
+def write_table(table, path):
+    with open(path, mode='w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Frame', 'Sample', 'Timestamp_ns', 'Position', 'Interpolated'])
+        writer.writerows(zip(table['frame'].tolist(), table['sample'].tolist(), table['timestamp_ns'].tolist(),
+                             table['position'].tolist(), table['interpolated'].astype(int).tolist()))
+
+
+def align_session(recording_path, video_path, output_path=None, exact=False):
+    _, freq, _ = read_header(recording_path)
+    records = load_session(recording_path)
+    frame_count = count_frames_exact(video_path) if exact else count_frames(video_path)
+    if frame_count is None:
+        raise IOError(f"Could not open video: {video_path}")
+    table, report = align(records, frame_count, freq)
+    if output_path is None:
+        output_path = os.path.splitext(recording_path)[0] + '_frames.csv'
+    write_table(table, output_path)
+    report.update({'recording': recording_path, 'video': video_path, 'output': output_path})
+    return report
+
+
+def find_sessions(root):
+    # Pair each recording with the video sharing its file name, or with the only video in its directory
+    pairs = []
+    for dirpath, _, filenames in os.walk(root):
+        videos = sorted(f for f in filenames if f.lower().endswith(VIDEO_EXTENSIONS))
+        recordings = sorted(f for f in filenames if f.lower().endswith(RECORDING_EXTENSIONS) and not f.endswith(('_frames.csv', '_bouts.csv')))
+        stems = {os.path.splitext(v)[0]: v for v in videos}
+        for recording in recordings:
+            video = stems.get(os.path.splitext(recording)[0])
+            if video is None and len(videos) == 1 and len(recordings) == 1:
+                video = videos[0]
+            if video is not None:
+                pairs.append((os.path.join(dirpath, recording), os.path.join(dirpath, video)))
+    return pairs
+
+
+def _align_pair(job):
+    pair, exact = job
+    try:
+        return align_session(*pair, exact=exact)
+    except Exception as e:
+        return {'recording': pair[0], 'video': pair[1], 'error': str(e)}
+
+
+def align_directory(root, workers=None, exact=False):
+    pairs = find_sessions(root)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_align_pair, [(pair, exact) for pair in pairs]))
+
+
+def print_report(report):
+    if 'error' in report:
+        print(f"{report['recording']}: ERROR {report['error']}")
+        return
+    print(f"{report['recording']}: {report['samples']} samples, {report['frames']} frames, "
+          f"{report['dropped_samples']} dropped samples (from {report['drops_from']}), {report['missing_frames']} missing frames, "
+          f"{report['extra_frames']} extra frames -> {report['output']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Align encoder samples with camera frames.")
+    parser.add_argument("recording", type=str, nargs='?', help="Recording file (CSV or .session).")
+    parser.add_argument("video", type=str, nargs='?', help="Video file recorded with the same trigger.")
+    parser.add_argument("--root", type=str, default=None, help="Align every session found under this directory.")
+    parser.add_argument("--exact", action='store_true', default=False, help="Count frames by grabbing them instead of trusting the container.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    args = parser.parse_args()
+
+    if args.root:
+        for report in align_directory(args.root, args.workers, args.exact):
+            print_report(report)
+    elif args.recording and args.video:
+        print_report(align_session(args.recording, args.video, exact=args.exact))
+    else:
+        parser.error("Pass a recording and a video, or --root.")
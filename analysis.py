@@ -0,0 +1,211 @@
+import re
+import csv
+import itertools
+import numpy as np
+from datetime import datetime
+
+from session_file import RECORD_DTYPE, SessionReader
+from archive_file import ArchiveReader
+
+# Both text layouts are read into the same columns as the recorder writes:
+#   counter, timestamp_ns (ns since the epoch), period_ms, position
+# 'cli' files come from read_encoder.py: a "Started recording:" row, then Counter,Timestamp,Period,Position (period in ms).
+# 'gui' files come from SerialApp: Frame,Timestamp,Timestep,Position (timestep in s).
+
+# File names the readers give their CSVs: read_encoder.py's serial_data_<timestamp>.csv
+# and SerialApp's Subject_Date_Run.csv, but not the _frames/_bouts tables written beside them.
+# A GUI name is split at its last two underscores, so the subject may contain underscores.
+CLI_FILE_PATTERN = re.compile(r'^serial_data_(?!.*_(frames|bouts)\.csv$).+\.csv$')
+GUI_FILE_PATTERN = re.compile(r'^(?!serial_data_)(?!.*_(frames|bouts)\.csv$)'
+                              r'(?P<subject>.+)_(?P<date>[^_]+)_(?P<run>[^_]+)\.csv$')
+
+
+def local_to_epoch_ns(local_ns):
+    # CSV timestamps are local wall-clock times, shift them to epoch ns like the recorder
+    # uses. The UTC offset is looked up per distinct second, so files spanning a daylight
+    # saving change convert correctly on both sides of it.
+    local_ns = np.asarray(local_ns, dtype=np.int64)
+    if local_ns.size == 0:
+        return local_ns
+    seconds, inverse = np.unique(local_ns // 1_000_000_000, return_inverse=True)
+    offsets_ns = np.array([s - round(np.datetime64(s, 's').item().timestamp()) for s in seconds.tolist()],
+                          dtype=np.int64) * 1_000_000_000
+    return local_ns - offsets_ns[inverse.reshape(local_ns.shape)]
+
+
+def read_header(path):
+    # Returns (layout, freq, start_time_ns) without reading the data rows
+    if path.endswith('.session'):
+        with SessionReader(path) as session:
+            return 'session', session.freq or None, session.start_time_ns
+    if path.endswith('.archive'):
+        with ArchiveReader(path) as archive:
+            return 'archive', archive.freq or None, archive.start_time_ns
+    with open(path, newline='') as f:
+        first = next(csv.reader(f), [])
+    if first and first[0] == 'Started recording:':
+        start_time_ns = int(local_to_epoch_ns(np.datetime64(first[1], 'ns').astype(np.int64)))
+        m = re.search(r'([\d.]+)\s*Hz', first[2]) if len(first) > 2 else None
+        return 'cli', float(m.group(1)) if m else None, start_time_ns
+    if first and first[0] == 'Frame':
+        return 'gui', None, None
+    raise ValueError(f"Unrecognized recording layout: {path}")
+
+
+def _parse_rows(rows, layout, file_units=False):
+    columns = list(zip(*rows))
+    records = np.empty(len(rows), dtype=RECORD_DTYPE)
+    records['counter'] = np.asarray(columns[0], dtype=np.int64)
+    records['timestamp_ns'] = local_to_epoch_ns(np.asarray(columns[1], dtype='datetime64[ns]').astype(np.int64))
+    period = np.asarray(columns[2], dtype=np.float64)
+    records['period_ms'] = period * 1000 if layout == 'gui' and not file_units else period
+    records['position'] = np.asarray(columns[3], dtype=np.float64).astype(np.int64)
+    return records
+
+
+def iter_chunks(path, chunk_size=100000, file_units=False):
+    # Stream a recording as RECORD_DTYPE arrays of at most chunk_size rows. With
+    # file_units the period column keeps the file's own unit (s for GUI files, which
+    # don't survive a round trip through ms exactly) instead of being converted to ms.
+    layout, _, _ = read_header(path)
+    if layout == 'session':
+        with SessionReader(path) as session:
+            for start in range(0, len(session), chunk_size):
+                yield np.array(session.records[start:start + chunk_size])
+        return
+    if layout == 'archive':
+        # Archive chunks are re-cut to chunk_size so callers see the same chunking
+        with ArchiveReader(path) as archive:
+            scale = 1000 if archive.metadata.get('period_unit') == 's' and not file_units else 1
+            carry = np.empty(0, dtype=RECORD_DTYPE)
+            for records in archive.iter_chunks():
+                records['period_ms'] *= scale
+                carry = np.concatenate((carry, records))
+                while len(carry) >= chunk_size:
+                    yield carry[:chunk_size]
+                    carry = carry[chunk_size:]
+            if len(carry):
+                yield carry
+        return
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        for _ in range(2 if layout == 'cli' else 1):
+            next(reader)
+        while True:
+            rows = [row for row in itertools.islice(reader, chunk_size) if len(row) >= 4]
+            if not rows:
+                break
+            yield _parse_rows(rows, layout, file_units)
+
+
+def load_session(path):
+    # Whole recording in memory, use iter_chunks for very long sessions
+    chunks = list(iter_chunks(path))
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=RECORD_DTYPE)
+
+
+def iter_kinematics(path, chunk_size=100000, counts_per_unit=1.0):
+    # Per-chunk instantaneous velocity (units/s) and cumulative distance (units),
+    # carrying the last sample over chunk boundaries so results match a full load.
+    # The board prints pos + count and the counter is the trigger count, so the
+    # counter's advance since the first sample is taken out of every position.
+    first_counter = None
+    last_time_ns = None
+    last_position = None
+    distance = 0.0
+    for records in iter_chunks(path, chunk_size):
+        times = records['timestamp_ns']
+        if first_counter is None:
+            first_counter = int(records['counter'][0])
+        positions = (records['position'] - (records['counter'] - first_counter)) / counts_per_unit
+        prev_times = np.concatenate(([times[0] if last_time_ns is None else last_time_ns], times[:-1]))
+        prev_positions = np.concatenate(([positions[0] if last_position is None else last_position], positions[:-1]))
+
+        dt = (times - prev_times) / 1e9
+        dpos = positions - prev_positions
+        velocity = np.divide(dpos, dt, out=np.zeros_like(dpos), where=dt > 0)
+        cumulative = distance + np.cumsum(np.abs(dpos))
+
+        last_time_ns = int(times[-1])
+        last_position = float(positions[-1])
+        distance = float(cumulative[-1])
+        yield {'timestamp_ns': times, 'position': positions, 'velocity': velocity, 'distance': cumulative}
+
+
+def iter_resampled(path, freq=None, chunk_size=100000):
+    # Linearly interpolate positions onto a uniform grid at freq Hz (the recorded --freq
+    # by default), yielding (grid_times_ns, positions) one chunk at a time. Positions
+    # leave out the board's one count per trigger, like iter_kinematics.
+    if freq is None:
+        _, freq, _ = read_header(path)
+    if not freq:
+        raise ValueError("The recording has no frequency in its header, pass freq explicitly.")
+    step_ns = 1e9 / freq
+
+    t0 = None
+    first_counter = None
+    next_index = 0
+    carry_times = np.empty(0, dtype=np.int64)
+    carry_positions = np.empty(0, dtype=np.float64)
+    for records in iter_chunks(path, chunk_size):
+        if first_counter is None:
+            first_counter = int(records['counter'][0])
+        wheel = (records['position'] - (records['counter'] - first_counter)).astype(np.float64)
+        times = np.concatenate((carry_times, records['timestamp_ns']))
+        positions = np.concatenate((carry_positions, wheel))
+        if t0 is None:
+            t0 = int(times[0])
+        last_index = int((times[-1] - t0) // step_ns)
+        grid = np.arange(next_index, last_index + 1) * step_ns
+        if len(grid):
+            # Interpolate relative to t0 so float64 keeps ns resolution
+            yield t0 + grid.astype(np.int64), np.interp(grid, (times - t0).astype(np.float64), positions)
+        next_index = last_index + 1
+        # Keep the last sample so the next chunk interpolates across the boundary
+        carry_times = times[-1:]
+        carry_positions = positions[-1:]
+
+
+def summarize(path, chunk_size=100000, gap_factor=1.5):
+    # Streaming summary of a recording with bounded memory. Jitter is the std of the
+    # sample periods; a gap is a period longer than gap_factor times the median period
+    # of the first chunk (or the trigger interval when the header has the frequency).
+    _, freq, _ = read_header(path)
+    interval_ms = 1000 // int(freq) if freq else None
+    n = 0
+    first_time_ns = last_time_ns = None
+    distance = 0.0
+    peak_speed = 0.0
+    periods = period_sum = period_sq_sum = 0.0
+    gaps = 0
+    for chunk in iter_kinematics(path, chunk_size):
+        times = chunk['timestamp_ns']
+        if first_time_ns is None:
+            first_time_ns = int(times[0])
+            period = np.diff(times) / 1e6
+        else:
+            period = np.diff(np.concatenate(([last_time_ns], times))) / 1e6
+        if interval_ms is None and len(period):
+            interval_ms = float(np.median(period))
+        n += len(times)
+        last_time_ns = int(times[-1])
+        distance = float(chunk['distance'][-1])
+        peak_speed = max(peak_speed, float(np.abs(chunk['velocity']).max()))
+        periods += len(period)
+        period_sum += float(period.sum())
+        period_sq_sum += float(np.square(period).sum())
+        if interval_ms:
+            gaps += int(np.count_nonzero(period > gap_factor * interval_ms))
+    duration = (last_time_ns - first_time_ns) / 1e9 if n else 0.0
+    period_mean = period_sum / periods if periods else 0.0
+    return {
+        'samples': n,
+        'start': datetime.fromtimestamp(first_time_ns / 1e9) if n else None,
+        'duration_s': duration,
+        'rate_hz': (n - 1) / duration if duration else 0.0,
+        'distance': distance,
+        'peak_speed': peak_speed,
+        'mean_speed': distance / duration if duration else 0.0,
+        'jitter_ms': float(np.sqrt(max(0.0, period_sq_sum / periods - period_mean ** 2))) if periods else 0.0,
+        'gaps': gaps,
+    }
@@ -0,0 +1,277 @@
+import os
+import json
+import lzma
+import zlib
+import numpy as np
+
+from session_file import RECORD_DTYPE
+
+# Compressed archive layout (all little-endian):
+#   MAGIC, u4 metadata length, metadata as JSON (freq, start_time_ns, port, codec, ...)
+#   chunks, each a CHUNK_DTYPE header followed by `size` bytes of compressed payload
+#   INDEX_DTYPE entry per chunk, then TRAILER_DTYPE
+#
+# A chunk payload is one varint stream holding, for its `count` records:
+#   counter       zigzag deltas from first_counter
+#   timestamp_ns  zigzag delta-of-deltas from first_timestamp_ns (nearly uniform -> ~0)
+#   period_ms     zigzag deltas of period_ms * 10**period_scale when that is exact,
+#                 otherwise (period_scale = -1) XOR deltas of the float64 bits
+#   position      zigzag deltas, the first one from 0
+# compressed with the file's codec. The index lets readers decode single chunks; if it is
+# missing after a crash, the chunk headers are scanned instead and a torn last chunk is dropped.
+MAGIC = b'ENCARCH1'
+TRAILER_MAGIC = b'ENCAIDX1'
+
+CHUNK_DTYPE = np.dtype([
+    ('count', '<u4'),
+    ('size', '<u4'),
+    ('period_scale', '<i4'),
+    ('reserved', '<u4'),
+    ('first_counter', '<i8'),
+    ('first_timestamp_ns', '<i8'),
+    ('last_timestamp_ns', '<i8'),
+])
+INDEX_DTYPE = np.dtype([
+    ('offset', '<u8'),
+    ('count', '<u8'),
+    ('first_timestamp_ns', '<i8'),
+    ('last_timestamp_ns', '<i8'),
+])
+TRAILER_DTYPE = np.dtype([
+    ('index_offset', '<u8'),
+    ('chunks', '<u8'),
+    ('magic', 'S8'),
+])
+
+CODECS = {
+    'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+    'none': (bytes, bytes),
+}
+
+_SHIFTS = (7 * np.arange(10)).astype(np.uint64)
+
+
+def zigzag(values):
+    values = np.asarray(values, dtype=np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def unzigzag(values):
+    values = np.asarray(values, dtype=np.uint64)
+    return (values >> np.uint64(1)).view(np.int64) ^ -(values & np.uint64(1)).view(np.int64)
+
+
+def encode_varints(values):
+    # LEB128 varints of a uint64 array, vectorized: at most 10 bytes per value
+    values = np.asarray(values, dtype=np.uint64)
+    if len(values) == 0:
+        return b''
+    lengths = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        lengths += values >= np.uint64(1 << (7 * k))
+    groups = ((values[:, None] >> _SHIFTS) & np.uint64(0x7F)).astype(np.uint8)
+    columns = np.arange(10)
+    groups[columns < (lengths - 1)[:, None]] |= 0x80
+    return groups[columns < lengths[:, None]].tobytes()
+
+
+def decode_varints(data):
+    data = np.frombuffer(data, dtype=np.uint8)
+    if len(data) == 0:
+        return np.empty(0, dtype=np.uint64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shifts = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    parts = (data & 0x7F).astype(np.uint64) << (7 * shifts).astype(np.uint64)
+    return np.add.reduceat(parts, starts)
+
+
+def _period_scale(periods):
+    # Smallest decimal scale that turns every period into an exact integer, -1 if none does
+    for scale in range(10):
+        scaled = np.round(periods * 10 ** scale)
+        if np.all(np.abs(scaled) < 2 ** 53) and np.array_equal(scaled / 10 ** scale, periods):
+            return scale
+    return -1
+
+
+def encode_chunk(records, compress):
+    n = len(records)
+    header = np.zeros(1, dtype=CHUNK_DTYPE)
+    header['count'] = n
+    header['first_counter'] = records['counter'][0]
+    header['first_timestamp_ns'] = records['timestamp_ns'][0]
+    header['last_timestamp_ns'] = records['timestamp_ns'][-1]
+
+    counters = np.diff(records['counter'], prepend=records['counter'][0])
+    deltas = np.diff(records['timestamp_ns'], prepend=records['timestamp_ns'][0])
+    periods = np.ascontiguousarray(records['period_ms'])
+    scale = _period_scale(periods)
+    if scale >= 0:
+        scaled = np.round(periods * 10 ** scale).astype(np.int64)
+        period_words = zigzag(np.diff(scaled, prepend=0))
+    else:
+        bits = periods.view(np.uint64)
+        period_words = bits ^ np.concatenate(([np.uint64(0)], bits[:-1]))
+    header['period_scale'] = scale
+
+    words = np.concatenate((zigzag(counters), zigzag(np.diff(deltas, prepend=0)), period_words,
+                            zigzag(np.diff(records['position'], prepend=0))))
+    payload = compress(encode_varints(words))
+    header['size'] = len(payload)
+    return header.tobytes() + payload
+
+
+def decode_chunk(header, payload, decompress):
+    n = int(header['count'])
+    words = decode_varints(decompress(payload))
+    if len(words) != 4 * n:
+        raise ValueError("Corrupt archive chunk.")
+    records = np.empty(n, dtype=RECORD_DTYPE)
+    records['counter'] = int(header['first_counter']) + np.cumsum(unzigzag(words[:n]))
+    records['timestamp_ns'] = int(header['first_timestamp_ns']) + np.cumsum(np.cumsum(unzigzag(words[n:2 * n])))
+    scale = int(header['period_scale'])
+    if scale >= 0:
+        records['period_ms'] = np.cumsum(unzigzag(words[2 * n:3 * n])) / 10 ** scale
+    else:
+        records['period_ms'] = np.bitwise_xor.accumulate(words[2 * n:3 * n]).view(np.float64)
+    records['position'] = np.cumsum(unzigzag(words[3 * n:]))
+    return records
+
+
+class ArchiveWriter:
+    # Recorder backend writing compressed chunks of chunk_records records. Only full
+    # chunks are written while recording, so slow sessions don't end up as many tiny,
+    # poorly compressed chunks; the partial last chunk is written on close (which is
+    # also what a segment rotation does). A crash loses at most that unfinished chunk.
+
+    def __init__(self, path, metadata=None, chunk_records=4096, codec='zlib'):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec}")
+        self.path = path
+        self.chunk_records = chunk_records
+        self.compress = CODECS[codec][0]
+        self.pending = []
+        self.n_pending = 0
+        self.index = []
+        self.file = open(path, mode='wb')
+        meta = json.dumps(dict(metadata or {}, codec=codec)).encode('utf-8')
+        self.file.write(MAGIC + len(meta).to_bytes(4, 'little') + meta)
+
+    def write(self, records):
+        self.pending.append(np.array(records, dtype=RECORD_DTYPE))
+        self.n_pending += len(records)
+        if self.n_pending >= self.chunk_records:
+            records = np.concatenate(self.pending)
+            full = len(records) - len(records) % self.chunk_records
+            for start in range(0, full, self.chunk_records):
+                self._write_chunk(records[start:start + self.chunk_records])
+            self.pending = [records[full:]]
+            self.n_pending = len(records) - full
+
+    def _write_chunk(self, records):
+        self.index.append((self.file.tell(), len(records), records['timestamp_ns'][0], records['timestamp_ns'][-1]))
+        self.file.write(encode_chunk(records, self.compress))
+
+    def _write_pending(self):
+        if self.n_pending:
+            self._write_chunk(np.concatenate(self.pending))
+            self.pending = []
+            self.n_pending = 0
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self._write_pending()
+        index = np.array(self.index, dtype=INDEX_DTYPE)
+        trailer = np.zeros(1, dtype=TRAILER_DTYPE)
+        trailer['index_offset'] = self.file.tell()
+        trailer['chunks'] = len(index)
+        trailer['magic'] = TRAILER_MAGIC
+        self.file.write(index.tobytes() + trailer.tobytes())
+        self.file.close()
+
+
+class ArchiveReader:
+    # Random access to a compressed archive: read_chunk(i) decodes only chunk i,
+    # between() only the chunks overlapping the requested time range.
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            self.file.close()
+            raise ValueError(f"{path} is not an encoder archive.")
+        length = int.from_bytes(self.file.read(4), 'little')
+        self.metadata = json.loads(self.file.read(length).decode('utf-8'))
+        self.data_offset = self.file.tell()
+        self.decompress = CODECS[self.metadata.get('codec', 'zlib')][1]
+        self.freq = self.metadata.get('freq')
+        self.start_time_ns = self.metadata.get('start_time_ns')
+        self.index = self._read_index()
+        if self.index is None:
+            self.index = self._scan_chunks()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return int(self.index['count'].sum())
+
+    @property
+    def chunk_count(self):
+        return len(self.index)
+
+    def _read_index(self):
+        size = os.path.getsize(self.path)
+        if size < self.data_offset + TRAILER_DTYPE.itemsize:
+            return None
+        self.file.seek(size - TRAILER_DTYPE.itemsize)
+        trailer = np.frombuffer(self.file.read(TRAILER_DTYPE.itemsize), dtype=TRAILER_DTYPE)[0]
+        if trailer['magic'] != TRAILER_MAGIC:
+            return None
+        self.file.seek(int(trailer['index_offset']))
+        return np.frombuffer(self.file.read(int(trailer['chunks']) * INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)
+
+    def _scan_chunks(self):
+        # No index (the writer never closed): walk the chunk headers, dropping a torn tail
+        size = os.path.getsize(self.path)
+        entries = []
+        offset = self.data_offset
+        while offset + CHUNK_DTYPE.itemsize <= size:
+            self.file.seek(offset)
+            header = np.frombuffer(self.file.read(CHUNK_DTYPE.itemsize), dtype=CHUNK_DTYPE)[0]
+            end = offset + CHUNK_DTYPE.itemsize + int(header['size'])
+            if header['count'] == 0 or end > size:
+                break
+            entries.append((offset, header['count'], header['first_timestamp_ns'], header['last_timestamp_ns']))
+            offset = end
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    def read_chunk(self, i):
+        self.file.seek(int(self.index['offset'][i]))
+        header = np.frombuffer(self.file.read(CHUNK_DTYPE.itemsize), dtype=CHUNK_DTYPE)[0]
+        return decode_chunk(header, self.file.read(int(header['size'])), self.decompress)
+
+    def iter_chunks(self):
+        for i in range(self.chunk_count):
+            yield self.read_chunk(i)
+
+    def read_all(self):
+        chunks = list(self.iter_chunks())
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=RECORD_DTYPE)
+
+    def between(self, start_ns, stop_ns):
+        # Records with start_ns <= timestamp_ns < stop_ns
+        hits = np.flatnonzero((self.index['last_timestamp_ns'] >= start_ns) & (self.index['first_timestamp_ns'] < stop_ns))
+        chunks = [self.read_chunk(i) for i in hits]
+        records = np.concatenate(chunks) if chunks else np.empty(0, dtype=RECORD_DTYPE)
+        return records[(records['timestamp_ns'] >= start_ns) & (records['timestamp_ns'] < stop_ns)]
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,140 @@
+import os
+import sys
+import csv
+import time
+import signal
+import resource
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+import serial
+from session_file import SessionReader
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_simulator(log_path, extra_args=()):
+    # The simulator runs in its own process so it doesn't count towards the reader's CPU
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, 'simulator.py'), '--exact', '--log', log_path, *extra_args],
+                            stdout=subprocess.PIPE, text=True)
+    port_name = proc.stdout.readline().strip()
+    return proc, port_name
+
+
+def stop_simulator(proc, log_path):
+    proc.send_signal(signal.SIGTERM)
+    proc.wait()
+    log = np.load(log_path)
+    return log['count'], log['send_time_ns']
+
+
+def run_cli(port_name, rate, duration, work_dir):
+    # Run the unmodified read_encoder.py script and collect its output and CPU time
+    env = dict(os.environ, HOME=work_dir)
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, 'read_encoder.py'), port_name, '--freq', str(rate),
+                             '--timer', str(duration), '--format', 'session', '--raw_timestamps'],
+                            env=env, stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    data_dir = os.path.join(work_dir, 'Documents', 'serial_data')
+    path = os.path.join(data_dir, sorted(f for f in os.listdir(data_dir) if f.endswith('.session'))[-1])
+    with SessionReader(path) as session:
+        positions = np.array(session.position)
+        times = np.array(session.timestamp_ns)
+    os.remove(path)
+    os.remove(os.path.splitext(path)[0] + '_summary.json')
+    return positions, times, usage.ru_utime + usage.ru_stime, True
+
+
+def run_gui(port_name, rate, duration, work_dir):
+    # Drive SerialApp's acquisition worker the same way toggleRecording does, without a window
+    from encoder_gui import AcquisitionWorker
+    path = os.path.join(work_dir, 'gui_run.csv')
+    ser = serial.Serial(port_name, 9600)
+    ser.write(f"A {rate}".encode())
+    time.sleep(0.1)
+    ser.write("S".encode())
+    ser.timeout = 0.1
+    before = resource.getrusage(resource.RUSAGE_SELF)
+    worker = AcquisitionWorker(ser, path, rate, raw_timestamps=True)
+    worker.start()
+    time.sleep(duration)
+    worker.stop()
+    worker.wait()
+    after = resource.getrusage(resource.RUSAGE_SELF)
+    ser.write("E".encode())
+    ser.close()
+
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))[1:]
+    os.remove(path)
+    os.remove(os.path.splitext(path)[0] + '_summary.json')
+    positions = np.array([int(row[3]) for row in rows], dtype=np.int64)
+    local = np.array([row[1].replace(' ', 'T') for row in rows], dtype='datetime64[us]').astype(np.int64) * 1000
+    times = local - int(time.localtime().tm_gmtoff) * 1_000_000_000
+    cpu = (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+    # The GUI records raw pos+count values, the CLI offsets them by the first sample
+    return positions, times, cpu, False
+
+
+def analyze(sent_counts, send_times, positions, host_times, offset):
+    # With a stationary wheel every line is just the trigger count, so each received
+    # sample can be matched to the moment the simulator sent it
+    if len(positions) == 0 or len(sent_counts) == 0:
+        return {'received': 0, 'lost': len(sent_counts), 'latency_ms': [np.nan] * 4}
+    counts = positions + sent_counts[0] if offset else positions
+    index = counts - sent_counts[0]
+    valid = (index >= 0) & (index < len(sent_counts))
+    index = index[valid]
+    expected = int(index.max()) + 1
+    lost = expected - len(np.unique(index))
+    latency = (host_times[valid] - send_times[index]) / 1e6
+    return {
+        'received': len(positions),
+        'lost': lost,
+        'latency_ms': np.percentile(latency, [50, 95, 99, 100]).tolist(),
+    }
+
+
+READERS = {'cli': run_cli, 'gui': run_gui}
+
+
+def benchmark(readers, rates, duration, sim_args=()):
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name in readers:
+            for rate in rates:
+                log_path = os.path.join(work_dir, 'sent.npz')
+                proc, port_name = start_simulator(log_path, sim_args)
+                try:
+                    positions, times, cpu, offset = READERS[name](port_name, rate, duration, work_dir)
+                finally:
+                    sent_counts, send_times = stop_simulator(proc, log_path)
+                result = analyze(sent_counts, send_times, positions, times, offset)
+                result.update({'reader': name, 'rate': rate, 'cpu_percent': 100 * cpu / duration})
+                results.append(result)
+                p50, p95, p99, pmax = result['latency_ms']
+                print(f"{name:>4} {rate:>6} Hz  received={result['received']:>7} lost={result['lost']:>5}  "
+                      f"latency p50={p50:.2f} p95={p95:.2f} p99={p99:.2f} max={pmax:.2f} ms  "
+                      f"cpu={result['cpu_percent']:.1f}%")
+
+    for name in readers:
+        lossless = [r['rate'] for r in results if r['reader'] == name and r['lost'] == 0 and r['received'] > 0]
+        print(f"{name}: max lossless rate {max(lossless) if lossless else 0} Hz")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput and latency benchmark against the encoder simulator.")
+    parser.add_argument("--readers", nargs='+', default=['cli', 'gui'], choices=list(READERS), help="Readers to benchmark.")
+    parser.add_argument("--rates", nargs='+', type=int, default=[100, 200, 500, 1000, 2000, 5000], help="Sampling rates in Hz.")
+    parser.add_argument("--duration", type=int, default=5, help="Seconds per run.")
+    parser.add_argument("--jitter_ms", type=float, default=0.0, help="Simulator send jitter in ms.")
+    parser.add_argument("--burst_prob", type=float, default=0.0, help="Simulator burst probability.")
+    parser.add_argument("--garbage_prob", type=float, default=0.0, help="Simulator garbage line probability.")
+    args = parser.parse_args()
+
+    sim_args = ['--jitter_ms', str(args.jitter_ms), '--burst_prob', str(args.burst_prob), '--garbage_prob', str(args.garbage_prob)]
+    benchmark(args.readers, args.rates, args.duration, sim_args)
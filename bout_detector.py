@@ -0,0 +1,99 @@
+import csv
+import numpy as np
+
+from recorder import format_timestamps
+
+ONSET = 1
+OFFSET = 0
+
+# One running-bout transition: kind (ONSET/OFFSET), the counter of the sample that
+# triggered it, that sample's time and the smoothed velocity (counts/s) at that point
+EVENT_DTYPE = np.dtype([
+    ('kind', '<i1'),
+    ('counter', '<i8'),
+    ('timestamp_ns', '<i8'),
+    ('velocity', '<f8'),
+])
+
+
+class BoutDetector:
+    # Online running-bout detection. Velocity is smoothed over the last `window`
+    # samples, (p[i] - p[i - window]) / (t[i] - t[i - window]), using a fixed-size
+    # history carried between chunks, so work and memory per sample stay constant.
+    # A bout starts when the speed reaches onset_speed and ends when it drops below
+    # offset_speed; the gap between the two keeps noise near a threshold from toggling.
+    # Positions are what the board prints, pos + count: the counter (the trigger count)
+    # is subtracted first, or a stationary wheel would read freq counts/s.
+
+    def __init__(self, freq, onset_speed, offset_speed=None, window_s=0.25):
+        self.onset_speed = onset_speed
+        self.offset_speed = onset_speed / 2 if offset_speed is None else offset_speed
+        if self.offset_speed > self.onset_speed:
+            raise ValueError("offset_speed must not exceed onset_speed.")
+        self.window = max(1, int(round(window_s * freq)))
+        self.history_times = np.empty(0, dtype=np.int64)
+        self.history_positions = np.empty(0, dtype=np.int64)
+        self.running = False
+        self.velocity = 0.0
+        self.bouts = 0
+
+    def update(self, counters, timestamps_ns, positions):
+        # Feed one chunk, returns the EVENT_DTYPE transitions it contains
+        n = len(positions)
+        if n == 0:
+            return np.empty(0, dtype=EVENT_DTYPE)
+        times = np.concatenate((self.history_times, timestamps_ns))
+        pos = np.concatenate((self.history_positions, np.asarray(positions, dtype=np.int64) - np.asarray(counters, dtype=np.int64)))
+        h = len(self.history_times)
+        # Window start for each new sample, clipped to the oldest sample we have
+        start = np.maximum(np.arange(h, h + n) - self.window, 0)
+        dt = (times[h:] - times[start]) / 1e9
+        dpos = (pos[h:] - pos[start]).astype(np.float64)
+        velocity = np.divide(dpos, dt, out=np.zeros(n), where=dt > 0)
+        speed = np.abs(velocity)
+
+        # Hysteresis: +1 where the speed forces running, -1 where it forces stopping,
+        # carry the last forced state forward (starting from the current one)
+        forced = np.where(speed >= self.onset_speed, 1, np.where(speed < self.offset_speed, -1, 0))
+        state = np.full(n, 1 if self.running else -1)
+        if forced.any():
+            fill = np.maximum.accumulate(np.where(forced != 0, np.arange(n), -1))
+            state = np.where(fill >= 0, forced[np.maximum(fill, 0)], state)
+        previous = np.concatenate(([1 if self.running else -1], state[:-1]))
+        changes = np.flatnonzero(state != previous)
+
+        events = np.empty(len(changes), dtype=EVENT_DTYPE)
+        events['kind'] = np.where(state[changes] > 0, ONSET, OFFSET)
+        events['counter'] = np.asarray(counters)[changes]
+        events['timestamp_ns'] = np.asarray(timestamps_ns)[changes]
+        events['velocity'] = velocity[changes]
+
+        self.running = bool(state[-1] > 0)
+        self.velocity = float(velocity[-1])
+        self.bouts += int(np.count_nonzero(events['kind'] == ONSET))
+        self.history_times = times[-self.window:].copy()
+        self.history_positions = pos[-self.window:].copy()
+        return events
+
+
+class EventLog:
+    # Bout events as CSV next to the recording (<recording>_bouts.csv), flushed on
+    # every write so the file is current while the session is still running
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, mode='w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(['Event', 'Counter', 'Timestamp', 'Velocity'])
+        self.file.flush()
+
+    def write(self, events):
+        if len(events) == 0:
+            return
+        kinds = np.where(events['kind'] == ONSET, 'onset', 'offset').tolist()
+        self.writer.writerows(zip(kinds, events['counter'].tolist(), format_timestamps(events['timestamp_ns'], digits=6),
+                                  np.round(events['velocity'], 3).tolist()))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
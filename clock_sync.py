@@ -0,0 +1,215 @@
+import time
+import math
+import numpy as np
+
+
+class MonotonicClock:
+    # High-resolution monotonic timestamps in epoch ns. perf_counter_ns() never jumps
+    # with NTP adjustments; one wall-clock reading at construction anchors it.
+
+    def __init__(self):
+        self.wall_ref_ns = time.time_ns()
+        self.perf_ref_ns = time.perf_counter_ns()
+
+    def now_ns(self):
+        return self.wall_ref_ns + (time.perf_counter_ns() - self.perf_ref_ns)
+
+    def to_perf_ns(self, t_ns):
+        # Back to the perf_counter domain, which other processes on this machine share
+        return t_ns - self.wall_ref_ns + self.perf_ref_ns
+
+
+class TriggerClock:
+    # Online fit of host arrival times against the firmware's trigger index.
+    # The sketch triggers every interval = 1000 / freq ms on its own crystal, so
+    # arrival(k) = offset + k * interval + delay, where the USB/scheduler delay is
+    # never negative. An exponentially weighted least-squares line gives the
+    # interval (and hence the board's clock drift), and a lower envelope of the
+    # residuals pins the line to the earliest arrivals. A line lost on the way
+    # leaves every later arrival about one interval late, so such gaps advance the
+    # trigger index instead of dragging the fit; a host stall makes arrivals late
+    # only until its backlog is read, so gaps are confirmed across reads and taken
+    # back when later arrivals come too early for them. Every update is O(1).
+
+    def __init__(self, freq, window=10000, warmup=20, outlier_sigma=4.0, envelope_leak_ms=0.001):
+        self.nominal_interval_ns = (1000 // int(freq)) * 1e6 if freq else None
+        self.window = window
+        self.warmup = warmup
+        self.outlier_sigma = outlier_sigma
+        self.envelope_leak_ns = envelope_leak_ms * 1e6
+
+        self.t0 = None
+        self.k = -1  # Trigger index of the last sample
+        self.n = 0
+        self.n_fit = 0
+        self.skipped = 0  # Triggers detected as lost
+        self.last_late_ns = None  # Lateness of the last sample if it was over half an interval
+        self.late_since_ns = None  # Read time of the first of the current run of late samples
+        self.gap_k = None  # Index of the sample after the last detected gap
+        self.rolled_back = 0  # Detected gaps the last update found wrong and took back
+        # Exponentially weighted means and covariances of (k, t)
+        self.mk = self.mt = 0.0
+        self.ckk = self.ckt = 0.0
+        self.envelope = None
+        # Residual statistics (Welford) for the jitter report
+        self.jitter_mean = 0.0
+        self.jitter_m2 = 0.0
+        self.jitter_min = math.inf
+        self.jitter_max = -math.inf
+
+    @property
+    def interval_ns(self):
+        if self.n_fit >= self.warmup and self.ckk > 0:
+            return self.ckt / self.ckk
+        if self.nominal_interval_ns:
+            return self.nominal_interval_ns
+        return (self.mt / self.mk) if self.mk else 0.0
+
+    def line(self, k):
+        b = self.interval_ns
+        return self.mt + b * (k - self.mk)
+
+    @property
+    def jitter_std_ns(self):
+        return math.sqrt(self.jitter_m2 / self.n) if self.n else 0.0
+
+    def lateness(self, t_ns, ahead=1):
+        # How much later than the trigger `ahead` indices after the last sample t_ns arrives
+        return float(t_ns - self.t0) - (self.line(self.k + ahead) + self.envelope)
+
+    def detect_gap(self, t_ns, next_t_ns=None, arrival_ns=None, next_arrival_ns=None):
+        # Triggers lost before the sample arriving at t_ns. One late arrival can just
+        # be a slow transfer, and every line of a backlog the host was too busy to read
+        # looks late too, so a gap needs a second late sample from a later read (half an
+        # interval or more after the first late one) to confirm it: the next sample when
+        # it is already here, otherwise the current one confirms the earlier late ones
+        # (which keep the index they were given). arrival_ns/next_arrival_ns are the raw
+        # read times when t_ns/next_t_ns were moved back within a batch. With jitter
+        # close to half an interval a gap can't be told from a slow transfer, so none
+        # are detected then.
+        if self.envelope is None or self.n_fit < self.warmup:
+            return 0
+        interval = self.interval_ns
+        tolerance = self.outlier_sigma * self.jitter_std_ns
+        if tolerance >= interval / 2:
+            return 0
+        arrival_ns = t_ns if arrival_ns is None else arrival_ns
+        late = self.lateness(t_ns)
+        if late <= interval / 2:
+            self.last_late_ns = self.late_since_ns = None
+            return 0
+        if self.late_since_ns is None:
+            self.late_since_ns = arrival_ns
+        confirm = None
+        if next_t_ns is not None:
+            next_arrival_ns = next_t_ns if next_arrival_ns is None else next_arrival_ns
+            if next_arrival_ns - self.late_since_ns >= interval / 2:
+                confirm = self.lateness(next_t_ns, ahead=2)
+        if confirm is None and self.last_late_ns is not None and arrival_ns - self.late_since_ns >= interval / 2:
+            confirm = self.last_late_ns
+        if confirm is None or confirm <= interval / 2:
+            self.last_late_ns = late
+            return 0
+        self.last_late_ns = self.late_since_ns = None
+        # The sample must still not look early once moved to its new index
+        late = min(late, confirm)
+        gap = max(1, int(round(late / interval)))
+        if late - gap * interval < -tolerance:
+            return 0
+        return gap
+
+    def update(self, t_ns, skipped=None, arrival_ns=None):
+        # Feed one arrival time, get back the de-jittered trigger time in epoch ns.
+        # skipped is the number of triggers known to be lost before this sample,
+        # None to detect it from the arrival time.
+        if self.t0 is None:
+            self.t0 = t_ns
+        if skipped is None:
+            skipped = self.detect_gap(t_ns, arrival_ns=arrival_ns)
+        self.rolled_back = 0
+        if self.n_fit >= self.warmup and self.lateness(t_ns, 1 + skipped) < -self.interval_ns / 2:
+            # Earlier than its trigger can be: a gap was counted that wasn't there. Take
+            # the detected gaps back out of the index; anything beyond them moves the
+            # line along with the index instead of letting early arrivals drag the fit.
+            shift = int(round(-self.lateness(t_ns, 1 + skipped) / self.interval_ns))
+            self.rolled_back = min(shift, self.skipped)
+            self.k -= self.rolled_back
+            self.skipped -= self.rolled_back
+            self.mk += shift - self.rolled_back
+        t = float(t_ns - self.t0)
+        self.k += 1 + skipped
+        self.skipped += skipped
+        if skipped:
+            self.gap_k = self.k
+        k = self.k
+        self.n += 1
+
+        residual = t - self.line(k) if self.n > 1 else 0.0
+        std = self.jitter_std_ns if self.n > 1 else 0.0
+        # Late bursts would drag the line, leave large positive residuals out of the fit
+        if self.n_fit < self.warmup or residual <= self.outlier_sigma * std + self.envelope_leak_ns:
+            self.n_fit += 1
+            alpha = max(1.0 / self.n_fit, 1.0 / self.window)
+            dk = k - self.mk
+            dt = t - self.mt
+            self.mk += alpha * dk
+            self.mt += alpha * dt
+            self.ckk = (1 - alpha) * (self.ckk + alpha * dk * dk)
+            self.ckt = (1 - alpha) * (self.ckt + alpha * dk * dt)
+            residual = t - self.line(k)
+
+        # Arrivals can only be late: track the lowest residual, slowly letting it rise
+        if self.envelope is None:
+            self.envelope = residual
+        else:
+            self.envelope = min(self.envelope + self.envelope_leak_ns, residual)
+
+        delta = residual - self.jitter_mean
+        self.jitter_mean += delta / self.n
+        self.jitter_m2 += delta * (residual - self.jitter_mean)
+        self.jitter_min = min(self.jitter_min, residual)
+        self.jitter_max = max(self.jitter_max, residual)
+
+        return self.t0 + int(round(self.line(k) + self.envelope))
+
+    def update_many(self, times_ns):
+        # Feed a batch of arrival times, returns the de-jittered times and the trigger
+        # index of every sample. Lines read in one go share an arrival time; they were
+        # sent an interval apart, so all but the last are moved back by that much.
+        # Gaps are confirmed by the next sample of the batch, and indices of this batch
+        # handed out after a gap that turns out to be wrong are rolled back with it.
+        arrivals = np.asarray(times_ns, dtype=np.int64)
+        times = arrivals
+        if len(times) > 1:
+            # Position of each sample counted back from the end of its run of equal times
+            last = np.concatenate((times[1:] != times[:-1], [True]))
+            run_end = np.flip(np.minimum.accumulate(np.flip(np.where(last, np.arange(len(times)), len(times)))))
+            times = times - ((run_end - np.arange(len(times))) * self.interval_ns).astype(np.int64)
+        times = times.tolist()
+        arrivals = arrivals.tolist()
+        dejittered = []
+        indices = []
+        for i, t in enumerate(times):
+            skipped = None
+            if i + 1 < len(times):
+                skipped = self.detect_gap(t, times[i + 1], arrivals[i], arrivals[i + 1])
+            dejittered.append(self.update(t, skipped, arrivals[i]))
+            if self.rolled_back:
+                indices = [index - self.rolled_back if index >= self.gap_k else index for index in indices]
+            indices.append(self.k)
+        return dejittered, indices
+
+    def stats(self):
+        interval = self.interval_ns
+        drift_ppm = (interval / self.nominal_interval_ns - 1) * 1e6 if self.nominal_interval_ns else None
+        return {
+            'samples': self.n,
+            'skipped': self.skipped,
+            'interval_ms': interval / 1e6,
+            'nominal_interval_ms': self.nominal_interval_ns / 1e6 if self.nominal_interval_ns else None,
+            'drift_ppm': drift_ppm,
+            'jitter_mean_ms': self.jitter_mean / 1e6,
+            'jitter_std_ms': self.jitter_std_ns / 1e6,
+            'jitter_min_ms': self.jitter_min / 1e6 if self.n else 0.0,
+            'jitter_max_ms': self.jitter_max / 1e6 if self.n else 0.0,
+        }
@@ -0,0 +1,174 @@
+import os
+import csv
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from analysis import read_header, iter_chunks, CLI_FILE_PATTERN, GUI_FILE_PATTERN
+from archive_file import ArchiveWriter, ArchiveReader, CODECS
+from session_file import RECORD_DTYPE
+from recorder import format_timestamps
+
+
+def find_recordings(paths):
+    # CSV recordings named by read_encoder.py (serial_data_*.csv) or SerialApp (Subject_Date_Run.csv)
+    recordings = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, filenames in os.walk(path):
+                recordings.extend(os.path.join(dirpath, f) for f in sorted(filenames)
+                                  if CLI_FILE_PATTERN.match(f) or GUI_FILE_PATTERN.match(f))
+        else:
+            recordings.append(path)
+    return recordings
+
+
+def _source_blocks(path, header_rows, block_rows):
+    # The header rows, then the data rows in lists of up to block_rows, blank lines left out
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        yield list(itertools.islice(reader, header_rows))
+        while True:
+            rows = [row for row in itertools.islice(reader, block_rows) if row]
+            if not rows:
+                return
+            yield rows
+
+
+def _rows_match(rows, records):
+    # Render the records back into the CSV's fields: counters, periods (in the file's
+    # unit) and positions as numbers, timestamps as local time text with each row's
+    # number of digits
+    if any(len(row) != 4 for row in rows):
+        return False  # The parser only keeps four columns
+    counters, timestamps, periods, positions = zip(*rows)
+    try:
+        same_numbers = (np.array_equal(np.asarray(counters, dtype=np.float64), records['counter']) and
+                        np.array_equal(np.asarray(periods, dtype=np.float64), records['period_ms']) and
+                        np.array_equal(np.asarray(positions, dtype=np.float64), records['position']))
+    except ValueError:
+        return False
+    if not same_numbers:
+        return False
+    # Compare the timestamps per number of digits: the GUI wrote str(datetime), which
+    # leaves out the fraction when the microsecond is 0
+    digits = np.array([len(timestamp.partition('.')[2]) for timestamp in timestamps])
+    timestamps = np.array(timestamps, dtype=object)
+    for n in np.unique(digits).tolist():
+        if n not in (0, 3, 6, 9):
+            return False
+        rows = digits == n
+        if timestamps[rows].tolist() != format_timestamps(records['timestamp_ns'][rows], n):
+            return False
+    return True
+
+
+def _matches_source(path, archive, chunk_records):
+    # Compare the archive with the CSV text itself rather than with another parse of it,
+    # so whatever the parser drops or rounds (header rows, extra columns, timestep
+    # digits, per-row UTC offsets) fails verification
+    blocks = _source_blocks(path, len(archive.metadata['header']), chunk_records)
+    if next(blocks) != archive.metadata['header']:
+        return False
+    chunks = archive.iter_chunks()
+    carry = np.empty(0, dtype=RECORD_DTYPE)
+    for rows in blocks:
+        while len(carry) < len(rows):
+            records = next(chunks, None)
+            if records is None:
+                return False
+            carry = np.concatenate((carry, records))
+        if not _rows_match(rows, carry[:len(rows)]):
+            return False
+        carry = carry[len(rows):]
+    return len(carry) == 0 and next(chunks, None) is None
+
+
+def convert_file(path, output_path=None, codec='zlib', chunk_records=4096, verify=True, overwrite=False):
+    if output_path is None:
+        output_path = os.path.splitext(path)[0] + '.archive'
+    report = {'source': path, 'output': output_path, 'source_bytes': os.path.getsize(path)}
+    if not overwrite and os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(path):
+        report.update(skipped=True, archive_bytes=os.path.getsize(output_path))
+        return report
+
+    layout, freq, start_time_ns = read_header(path)
+    with open(path, newline='') as f:
+        header = list(itertools.islice(csv.reader(f), 2 if layout == 'cli' else 1))
+    # Periods stay in the file's unit and the header rows are kept verbatim, so the
+    # CSV can be rendered back from the archive
+    metadata = {'freq': freq, 'start_time_ns': start_time_ns, 'layout': layout, 'source': os.path.basename(path),
+                'header': header, 'period_unit': 's' if layout == 'gui' else 'ms'}
+    # Written beside the output and only moved into place once complete (and verified),
+    # so a failed conversion never leaves an archive that later runs take as up to date
+    temp_path = output_path + '.tmp'
+    try:
+        writer = ArchiveWriter(temp_path, metadata, chunk_records=chunk_records, codec=codec)
+        records = 0
+        try:
+            for chunk in iter_chunks(path, chunk_records, file_units=True):
+                writer.write(chunk)
+                records += len(chunk)
+        finally:
+            writer.close()
+        report.update(records=records, archive_bytes=os.path.getsize(temp_path))
+
+        if verify:
+            with ArchiveReader(temp_path) as archive:
+                report['verified'] = _matches_source(path, archive, chunk_records)
+            if not report['verified']:
+                report['error'] = "archive does not reproduce the CSV, archive removed"
+                os.remove(temp_path)
+                return report
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return report
+
+
+def _convert(job):
+    path, kwargs = job
+    try:
+        return convert_file(path, **kwargs)
+    except Exception as e:
+        return {'source': path, 'error': str(e)}
+
+
+def convert_batch(paths, workers=None, **kwargs):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_convert, [(path, kwargs) for path in paths]))
+
+
+def print_report(report):
+    if 'error' in report:
+        print(f"{report['source']}: ERROR {report['error']}")
+    elif report.get('skipped'):
+        print(f"{report['source']}: up to date")
+    else:
+        ratio = report['source_bytes'] / report['archive_bytes'] if report['archive_bytes'] else 0
+        verified = ", verified" if report.get('verified') else ""
+        print(f"{report['source']}: {report['records']} samples, {ratio:.1f}x smaller{verified} -> {report['output']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert CSV recordings to compressed .archive files.")
+    parser.add_argument("paths", type=str, nargs='+', help="CSV recordings or directories to scan.")
+    parser.add_argument("--codec", type=str, default="zlib", choices=list(CODECS), help="Compressor applied to each chunk.")
+    parser.add_argument("--chunk_records", type=int, default=4096, help="Records per independently readable chunk.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    parser.add_argument("--no_verify", action='store_true', default=False, help="Skip reading the archive back and comparing it with the CSV.")
+    parser.add_argument("--overwrite", action='store_true', default=False, help="Convert again even if the archive is newer than the CSV.")
+    args = parser.parse_args()
+
+    reports = convert_batch(find_recordings(args.paths), args.workers, codec=args.codec,
+                            chunk_records=args.chunk_records, verify=not args.no_verify, overwrite=args.overwrite)
+    for report in reports:
+        print_report(report)
+    failed = sum('error' in report for report in reports)
+    source_bytes = sum(report['source_bytes'] for report in reports if 'archive_bytes' in report)
+    archive_bytes = sum(report['archive_bytes'] for report in reports if 'archive_bytes' in report)
+    print(f"{len(reports) - failed} converted or up to date, {failed} failed, "
+          f"{source_bytes / 1e6:.1f} MB -> {archive_bytes / 1e6:.1f} MB")
@@ -1,4 +1,10 @@
+import os
+import json
+import argparse
 import cv2
+from concurrent.futures import ProcessPoolExecutor
+
+VIDEO_EXTENSIONS = ('.avi', '.mp4', '.mov', '.mkv')
 
 def count_frames(video_path):
     # Open the video file
@@ -17,10 +23,83 @@ def count_frames(video_path):
 
     return frame_count
 
-# Replace with the path to your video file
-video_path = '/path/to/your/video.avi'
+def count_frames_exact(video_path):
+    # Container frame counts are unreliable for some AVI files, so walk the stream.
+    # grab() demuxes each frame without converting it, which is much cheaper than read().
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print("Error: Could not open video.")
+        return
+
+    frame_count = 0
+    while cap.grab():
+        frame_count += 1
+
+    cap.release()
+    return frame_count
+
+def load_cache(cache_path):
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'r') as file:
+            return json.load(file)
+    return {}
+
+def save_cache(cache, cache_path):
+    # Write to a temporary file first so an interrupted run never corrupts the cache
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(cache, file)
+    os.replace(tmp_path, cache_path)
+
+def _count(job):
+    path, exact = job
+    return count_frames_exact(path) if exact else count_frames(path)
+
+def find_videos(paths):
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, filenames in os.walk(path):
+                videos.extend(os.path.join(dirpath, f) for f in sorted(filenames) if f.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            videos.append(path)
+    return videos
+
+def count_frames_batch(video_paths, exact=False, cache_path=None, workers=None):
+    # Count frames for many videos in parallel. Results are cached by path, size and
+    # mtime so only new or changed files are opened on the next run.
+    cache = load_cache(cache_path)
+    results = {}
+    todo = []
+    for path in video_paths:
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = cache.get(path)
+        if (entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns
+                and (entry['exact'] or not exact)):
+            results[path] = entry['frames']
+        else:
+            todo.append((path, stat))
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = pool.map(_count, [(path, exact) for path, _ in todo])
+            for (path, stat), frames in zip(todo, counts):
+                results[path] = frames
+                if frames is not None:
+                    cache[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'exact': exact, 'frames': frames}
+        if cache_path:
+            save_cache(cache, cache_path)
+    return results
 
-# Count the frames
-num_frames = count_frames(video_path)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Count video frames.")
+    parser.add_argument("paths", type=str, nargs='+', help="Video files or directories to scan.")
+    parser.add_argument("--exact", action='store_true', default=False, help="Count by grabbing every frame instead of trusting the container.")
+    parser.add_argument("--cache", type=str, default="frame_counts.json", help="Cache file, pass an empty string to disable.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    args = parser.parse_args()
 
-print(f"The video has {num_frames}
+    results = count_frames_batch(find_videos(args.paths), args.exact, args.cache or None, args.workers)
+    for path, num_frames in results.items():
+        print(f"{path}: {num_frames} frames")
@@ -2,16 +2,20 @@ import sys
 import os
 import json
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QComboBox, QLineEdit, QFileDialog, QMessageBox)
-from PyQt6.QtCore import QTimer
+from PyQt6.QtCore import QTimer, QThread
 import serial
 import serial.tools.list_ports
 import time
-from datetime import datetime
-import csv
 
 from PyQt6.QtWidgets import QLineEdit
 from PyQt6.QtCore import pyqtSignal, pyqtSlot
 
+from encoder_reader import EncoderReader
+from recorder import CSVBackend
+from live_plot import LivePlot
+from metrics import format_snapshot
+from bout_detector import BoutDetector, ONSET
+
 class ClickableLineEdit(QLineEdit):
     clicked = pyqtSignal()  # Signal to be emitted when the line edit is clicked
 
@@ -23,6 +27,62 @@ class ClickableLineEdit(QLineEdit):
         super().mousePressEvent(event)
         self.selectAll()  # Emit the clicked signal
 
+class AcquisitionWorker(QThread):
+    samplesReady = pyqtSignal(object, object)  # Batch of (host_time_ns, wheel positions) arrays
+    metricsReady = pyqtSignal(dict)  # Acquisition health snapshot, about once per second
+    boutEvents = pyqtSignal(object)  # Running onsets/offsets (bout_detector.EVENT_DTYPE)
+    failed = pyqtSignal(str)
+
+    def __init__(self, serial_connection, file_path, frequency, raw_timestamps=False, publish_url=None,
+                 bout_detector=None, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        # SerialApp sends the A/S/E commands itself, and the GUI records raw positions
+        self.reader = EncoderReader(ser=serial_connection, freq=frequency, output=CSVBackend(file_path, layout='gui'),
+                                    raw_timestamps=raw_timestamps, offset_positions=False, publish=publish_url,
+                                    send_commands=False, bout_detector=bout_detector)
+        self.reader.add_callback(self.onChunk)
+        self.reader.add_event_callback(self.boutEvents.emit)
+        self.frame_count = 0
+        self.first_counter = None
+        self._running = True
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        # A reader thread drains the port into the ring buffer, this thread writes the file.
+        # Errors are reported through `failed`, they must not escape the thread.
+        error = None
+        try:
+            self.reader.start()
+            last_report = time.monotonic()
+            while self._running:
+                self.reader.read(timeout=0.1)
+                if time.monotonic() - last_report >= 1:
+                    self.metricsReady.emit(self.reader.metrics.snapshot())
+                    last_report = time.monotonic()
+        except Exception as e:
+            error = e
+            self.failed.emit(str(e))
+        try:
+            self.reader.stop()
+        except Exception as e:
+            # stop() raises the reader's error again once everything is closed
+            if e is not error:
+                self.failed.emit(str(e))
+        summary = self.reader.summary
+        if summary is not None:
+            self.reader.metrics.write_summary(os.path.splitext(self.file_path)[0] + '_summary.json', summary['timing'])
+            self.metricsReady.emit(summary['metrics'])
+
+    def onChunk(self, chunk):
+        self.frame_count = self.reader.counter
+        # The file keeps the board's pos + count, the plot shows the wheel alone
+        if self.first_counter is None:
+            self.first_counter = int(chunk['counter'][0])
+        self.samplesReady.emit(chunk['timestamp_ns'], chunk['position'] - (chunk['counter'] - self.first_counter))
+
 class SerialApp(QWidget):
     def __init__(self):
         super().__init__()
@@ -32,8 +92,7 @@ class SerialApp(QWidget):
         self.frequency = 20
         self.positions = []
         self.frame_count = 0
-        self.csv_file = None
-        self.last_timestamp = None
+        self.worker = None
         self.last_subject = ""
         self.last_date = ""
 
@@ -131,6 +190,18 @@ class SerialApp(QWidget):
         self.subjectInput.textChanged.connect(self.onSubjectOrDateChanged)
         self.dateInput.textChanged.connect(self.onSubjectOrDateChanged)
 
+        # Row 5: Live position and velocity plot
+        self.livePlot = LivePlot()
+        layout.addWidget(self.livePlot)
+
+        # Row 6: Acquisition health
+        self.metricsLabel = QLabel("")
+        layout.addWidget(self.metricsLabel)
+
+        # Row 7: Running state, when bout detection is configured
+        self.boutLabel = QLabel("")
+        layout.addWidget(self.boutLabel)
+
         self.setLayout(layout)
 
     # Additional methods
@@ -210,6 +281,7 @@ class SerialApp(QWidget):
             try:
                 frequency = int(frequency_text)
                 if self.serial_connection and self.serial_connection.is_open:
+                    self.frequency = frequency
                     self.serial_connection.write(f"A {frequency}".encode())
                     time.sleep(0.1)
                     self.serial_connection.write("S".encode())
@@ -227,57 +299,71 @@ class SerialApp(QWidget):
             except ValueError:
                 QMessageBox.warning(self, "Error", "Please enter a valid integer for the recording frequency.")
         else:
-            # Stop the recording
-            self.stopDataListening()
-            self.startStopButton.setText('Start')
-            self.updateStartStopButtonStyle(True)
-            self.disableUIElementsDuringRecording(False)
+            self.stopRecording()
+
+    def stopRecording(self):
+        # Stop the recording
+        self.stopDataListening()
+        self.startStopButton.setText('Start')
+        self.updateStartStopButtonStyle(True)
+        self.disableUIElementsDuringRecording(False)
 
-            # Stop flashing effect and reset Disconnect button
-            self.flashingTimer.stop()  # Stop the flashing
-            self.connectButton.setText("Disconnect")
-            self.connectButton.setStyleSheet("background-color: gray; color: red;")  # Reset to original style
+        # Stop flashing effect and reset Disconnect button
+        self.flashingTimer.stop()  # Stop the flashing
+        self.connectButton.setText("Disconnect")
+        self.connectButton.setStyleSheet("background-color: gray; color: red;")  # Reset to original style
 
     def prepareCSVFile(self):
-        file_path = os.path.join(self.dataDirInput.text(), f"{self.subjectInput.text()}_{self.dateInput.text()}_{self.runInput.text()}.csv")
-        self.csv_file = open(file_path, 'w', newline='')
-        self.csv_writer = csv.writer(self.csv_file)
-        self.csv_writer.writerow(['Frame', 'Timestamp', 'Timestep', 'Position'])
+        self.csv_file_path = os.path.join(self.dataDirInput.text(), f"{self.subjectInput.text()}_{self.dateInput.text()}_{self.runInput.text()}.csv")
         self.frame_count = 0
-        self.last_timestamp = time.time()
-
-    def recordDataToCSV(self, position):
-        current_time = time.time()
-        timestep = current_time - self.last_timestamp
-        self.last_timestamp = current_time
-        self.frame_count += 1
-        self.csv_writer.writerow([self.frame_count, datetime.now(), timestep, position])
 
     def startDataListening(self):
         # Check if the serial connection is open
         if self.serial_connection and self.serial_connection.is_open:
-            self.dataTimer = QTimer(self)
-            self.dataTimer.timeout.connect(self.readSerialData)
-            self.dataTimer.start(10)  # Polling interval in milliseconds
+            # Short timeout so the worker notices a stop request promptly
+            self.serial_connection.timeout = 0.1
+            bout_detector = None
+            if self.config.get('bout_onset'):
+                bout_detector = BoutDetector(self.frequency, self.config['bout_onset'], self.config.get('bout_offset'))
+            self.worker = AcquisitionWorker(self.serial_connection, self.csv_file_path, self.frequency,
+                                            publish_url=self.config.get('publish'), bout_detector=bout_detector)
+            self.livePlot.clear(self.frequency)
+            self.boutLabel.setText("")
+            self.worker.samplesReady.connect(self.onSamplesReady)
+            self.worker.metricsReady.connect(self.onMetricsReady)
+            self.worker.boutEvents.connect(self.onBoutEvents)
+            self.worker.failed.connect(self.onAcquisitionFailed)
+            self.worker.start()
 
     def stopDataListening(self):
-        if hasattr(self, 'dataTimer'):
-            self.dataTimer.stop()
-            del self.dataTimer
-        if self.csv_file:
-            self.csv_file.close()
+        if self.worker:
+            self.worker.stop()
+            self.worker.wait()
+            self.worker = None
             self.incrementRunNumber()
         elif self.subjectInput.text() and self.dateInput.text():
             self.incrementRunNumber()
 
-    def readSerialData(self):
-        if self.serial_connection.in_waiting:
-            data = self.serial_connection.readline().decode().strip()
-            try:
-                position = int(data)  # Assuming data is an integer
-                self.recordDataToCSV(position)
-            except ValueError:
-                pass  # Handle non-integer data or define other behavior as needed
+    @pyqtSlot(object, object)
+    def onSamplesReady(self, times, positions):
+        self.frame_count += len(positions)
+        self.livePlot.addSamples(times, positions)
+
+    @pyqtSlot(dict)
+    def onMetricsReady(self, snapshot):
+        self.metricsLabel.setText(format_snapshot(snapshot))
+
+    @pyqtSlot(object)
+    def onBoutEvents(self, events):
+        state = "Running" if events['kind'][-1] == ONSET else "Stopped"
+        self.boutLabel.setText(f"{state} since frame {events['counter'][-1]}")
+
+    @pyqtSlot(str)
+    def onAcquisitionFailed(self, message):
+        # Put the UI back into the stopped state before telling the user
+        if self.startStopButton.text() == 'Stop':
+            self.stopRecording()
+        QMessageBox.warning(self, "Error", f"Acquisition stopped: {message}")
 
     def incrementRunNumber(self):
         # Read the current run number, increment it, and update the run input box
@@ -0,0 +1,256 @@
+import os
+import time
+import threading
+import numpy as np
+import serial
+
+from serial_reader import RingBuffer, SerialReaderThread
+from recorder import Recorder, BackgroundWriter, RotatingBackend, open_backend
+from clock_sync import MonotonicClock, TriggerClock
+from publisher import open_publisher, make_samples
+from metrics import AcquisitionMetrics
+from bout_detector import EventLog
+
+BAUD_RATE = 115200
+
+# One processed sample: counter, de-jittered (or raw) sample time and host arrival time
+# in epoch ns, and position
+SAMPLE_DTYPE = np.dtype([
+    ('counter', '<i8'),
+    ('timestamp_ns', '<i8'),
+    ('arrival_ns', '<i8'),
+    ('position', '<i8'),
+])
+
+
+class EncoderReader:
+    # Importable acquisition from one encoder board.
+    #
+    #     with EncoderReader('/dev/ttyACM0', freq=100, output='run.csv') as reader:
+    #         for chunk in reader.chunks():
+    #             handle(chunk['timestamp_ns'], chunk['position'])
+    #
+    # A background thread drains the port into a ring buffer. The caller's thread
+    # turns each backlog into one SAMPLE_DTYPE chunk (offset, de-jitter, publish,
+    # record) and hands it to registered callbacks and to read()/chunks()/run().
+
+    def __init__(self, port_name=None, freq=20, output=None, ser=None, buffer_size=65536, raw_timestamps=False,
+                 offset_positions=True, publish=None, clock=None, data_event=None, send_commands=True,
+                 background_writes=True, flush_interval=1.0, fsync=False, segment_s=None, segment_records=None,
+                 bout_detector=None):
+        self.port_name = port_name
+        self.freq = freq
+        self.output = output  # File path, a recorder backend, or None to not record
+        self.ser = ser
+        self._owns_serial = ser is None
+        self.raw_timestamps = raw_timestamps
+        self.offset_positions = offset_positions
+        self.send_commands = send_commands
+        self.publish_url = publish
+        # Persistence: a writer thread takes records off the acquisition path and
+        # flushes (optionally fsyncs) every flush_interval s; segment_s/segment_records
+        # split the output into numbered files
+        self.background_writes = background_writes
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.segment_s = segment_s
+        self.segment_records = segment_records
+        self.bout_detector = bout_detector  # BoutDetector fed with every chunk, or None
+
+        self.clock = clock or MonotonicClock()
+        self.data_event = data_event or threading.Event()
+        self.buffer = RingBuffer(buffer_size)
+        self.trigger_clock = TriggerClock(freq)
+        self.callbacks = []
+        self.event_callbacks = []
+        self.event_log = None
+        self.reader = None
+        self.recorder = None
+        self.publisher = None
+        self.writer = None
+        self.metrics = None
+        self.counter = 0
+        self.first_pos = None  # First raw value and counter, published positions are relative to them
+        self.first_counter = None
+        self.last_pos = None
+        self.running = False
+        self.summary = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def add_callback(self, callback):
+        # callback(chunk) is called with every processed chunk
+        self.callbacks.append(callback)
+
+    def add_event_callback(self, callback):
+        # callback(events) is called with the bout events (bout_detector.EVENT_DTYPE)
+        # as soon as the chunk containing them has been processed
+        self.event_callbacks.append(callback)
+
+    def start(self):
+        if self.ser is None:
+            self.ser = serial.Serial(self.port_name, BAUD_RATE, timeout=0.1)
+        try:
+            self.reader = SerialReaderThread(self.ser, self.buffer, self.clock, self.data_event)
+            if self.output is not None:
+                backend = self.output
+                if isinstance(self.output, str):
+                    metadata = {'freq': self.freq, 'start_time_ns': self.clock.now_ns(), 'port': self.port_name}
+                    if self.segment_s or self.segment_records:
+                        backend = RotatingBackend(self.output, metadata, self.segment_s, self.segment_records)
+                    else:
+                        backend = open_backend(self.output, metadata)
+                if self.background_writes:
+                    backend = self.writer = BackgroundWriter(backend, sync_interval=self.flush_interval, fsync=self.fsync)
+                self.recorder = Recorder(backend, flush_interval=self.flush_interval)
+            self.metrics = AcquisitionMetrics(self.freq, self.reader, self.buffer, self.writer, self.trigger_clock)
+            if self.publish_url:
+                self.publisher = open_publisher(self.publish_url)
+            output_path = self.output if isinstance(self.output, str) else getattr(self.output, 'path', None)
+            if self.bout_detector is not None and output_path:
+                self.event_log = EventLog(os.path.splitext(output_path)[0] + '_bouts.csv')
+
+            if self.send_commands:
+                self.ser.write(f"A {self.freq}\n".encode())
+                time.sleep(0.01)  # Delay the start to give the mcu time to process
+                self.ser.write("S\n".encode())
+        except BaseException:
+            # Don't leave the port or half-opened files behind
+            self._close()
+            raise
+        self.reader.start()
+        self.running = True
+
+    def stop(self):
+        # Stop the board, process whatever is left and close everything. A failing step
+        # doesn't skip the others: samples read before a port error are still written
+        # and every file is closed. Then the reader's error, or else the first one, is
+        # raised with the summary already saved.
+        if not self.running:
+            return self.summary
+        self.running = False
+        errors = []
+        if self.send_commands:
+            try:
+                self.ser.write("E\n".encode())
+            except Exception as e:
+                errors.append(e)
+        self.reader.stop()
+        self.reader.join()
+        try:
+            self._process_buffered()
+        except Exception as e:
+            errors.append(e)
+        errors += self._close()
+        self.summary = {'metrics': self.metrics.snapshot(), 'timing': self.trigger_clock.stats()}
+        if isinstance(self.output, str):
+            self.metrics.write_summary(self.summary_path(), self.summary['timing'])
+        if self.reader.error is not None:
+            raise self.reader.error
+        if errors:
+            raise errors[0]
+        return self.summary
+
+    def _close(self):
+        # Close every resource even if some fail, returns the errors
+        resources = [self.recorder, self.publisher, self.event_log]
+        if self._owns_serial:
+            resources.append(self.ser)
+        errors = []
+        for resource in resources:
+            if resource is None:
+                continue
+            try:
+                resource.close()
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+    def summary_path(self):
+        return os.path.splitext(self.output)[0] + '_summary.json'
+
+    def process(self):
+        # Turn everything buffered so far into one chunk
+        if self.reader.error is not None:
+            raise self.reader.error
+        return self._process_buffered()
+
+    def _process_buffered(self):
+        loop_start = time.perf_counter_ns()
+        arrivals, positions = self.buffer.pop_all()
+        chunk = self._process(arrivals, positions)
+        self.metrics.add_loop(time.perf_counter_ns() - loop_start)
+        if len(chunk):
+            for callback in self.callbacks:
+                callback(chunk)
+        return chunk
+
+    def _process(self, arrivals, positions):
+        if len(positions) == 0:
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+        self.metrics.add_batch(arrivals)
+        # Replace arrival times with the fitted trigger times. The counter is the
+        # 1-based trigger index, so lines lost on the way show up as counter gaps.
+        dejittered, indices = self.trigger_clock.update_many(arrivals)
+        dejittered = np.asarray(dejittered, dtype=np.int64)
+        counters = np.asarray(indices, dtype=np.int64) + 1
+        self.counter = int(counters[-1])
+        if self.first_pos is None:
+            self.first_pos = int(positions[0])
+            self.first_counter = int(counters[0])
+            self.last_pos = self.first_pos if self.offset_positions else 0
+
+        # Check if there's data
+        valid = positions != 0
+        chunk = np.empty(int(valid.sum()), dtype=SAMPLE_DTYPE)
+        chunk['counter'] = counters[valid]
+        chunk['timestamp_ns'] = arrivals[valid] if self.raw_timestamps else dejittered[valid]
+        chunk['arrival_ns'] = arrivals[valid]
+        chunk['position'] = positions[valid] - self.last_pos
+
+        if self.bout_detector is not None:
+            # Detect first, events are the most latency sensitive output
+            events = self.bout_detector.update(chunk['counter'], chunk['timestamp_ns'], chunk['position'])
+            if len(events):
+                for callback in self.event_callbacks:
+                    callback(events)
+                if self.event_log is not None:
+                    self.event_log.write(events)
+        if self.publisher is not None:
+            # Publish before touching the disk to keep the live path short. Consumers get
+            # the wheel position: relative to the first sample whether or not the recording
+            # is offset, and without the board's one count per trigger.
+            wheel = positions[valid] - self.first_pos - (chunk['counter'] - self.first_counter)
+            self.publisher.publish(make_samples(chunk['counter'], dejittered[valid],
+                                                self.clock.to_perf_ns(chunk['arrival_ns']), wheel))
+        if self.recorder is not None:
+            self.recorder.extend(chunk['timestamp_ns'], chunk['position'], chunk['counter'])
+        return chunk
+
+    def read(self, timeout=0.5):
+        # Wait up to timeout for new samples and return them as one chunk (possibly empty)
+        self.data_event.wait(timeout)
+        self.data_event.clear()
+        return self.process()
+
+    def chunks(self, timeout=0.5):
+        # Yield non-empty chunks until stop() is called
+        while self.running:
+            chunk = self.read(timeout)
+            if len(chunk):
+                yield chunk
+
+    def run(self, duration=0):
+        # Process samples, feeding callbacks, until duration seconds pass (0 = until
+        # stop() or Ctrl-C)
+        start_time = time.monotonic()
+        while self.running:
+            remaining = duration - (time.monotonic() - start_time) if duration else 0.5
+            if remaining <= 0:
+                break
+            self.read(min(remaining, 0.5))
@@ -0,0 +1,136 @@
+import numpy as np
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtCore import QTimer, QPointF
+from PyQt6.QtGui import QPainter, QPen, QColor, QPolygonF
+
+
+class HistoryBuffer:
+    # Fixed-size history of the most recent samples. Memory and the cost of a
+    # redraw stay constant no matter how long the session runs.
+
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.positions = np.zeros(capacity, dtype=np.float64)
+        self.velocities = np.zeros(capacity, dtype=np.float64)
+        self.index = 0  # Total samples written
+        self.last_time_ns = None
+        self.last_position = None
+
+    def clear(self):
+        self.index = 0
+        self.last_time_ns = None
+        self.last_position = None
+
+    def extend(self, times, positions):
+        if len(positions) == 0:
+            return
+        times = np.asarray(times, dtype=np.int64)[-self.capacity:]
+        positions = np.asarray(positions, dtype=np.float64)[-self.capacity:]
+
+        # Velocity in counts/s, carrying the previous sample across batches
+        prev_times = np.concatenate(([times[0] if self.last_time_ns is None else self.last_time_ns], times[:-1]))
+        prev_positions = np.concatenate(([positions[0] if self.last_position is None else self.last_position], positions[:-1]))
+        dt = (times - prev_times) / 1e9
+        velocities = np.divide(positions - prev_positions, dt, out=np.zeros(len(positions)), where=dt > 0)
+        self.last_time_ns = int(times[-1])
+        self.last_position = float(positions[-1])
+
+        n = len(positions)
+        idx = (self.index + np.arange(n)) % self.capacity
+        self.times[idx] = times
+        self.positions[idx] = positions
+        self.velocities[idx] = velocities
+        self.index += n
+
+    def latest(self):
+        # Samples in time order, oldest first
+        n = min(self.index, self.capacity)
+        idx = (self.index - n + np.arange(n)) % self.capacity
+        return self.times[idx], self.positions[idx], self.velocities[idx]
+
+
+def decimate_minmax(times, values, t_start, span_ns, width):
+    # Reduce samples to at most one (min, max) pair per pixel column
+    edges = t_start + (np.arange(width + 1) * (span_ns / width)).astype(np.int64)
+    bounds = np.searchsorted(times, edges)
+    starts = bounds[:-1]
+    nonempty = starts < bounds[1:]
+    if not nonempty.any():
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+    columns = np.flatnonzero(nonempty)
+    starts = starts[nonempty]
+    # Empty columns between two full ones add nothing, so reduceat over the full-column starts is exact
+    segment = values[starts[0]:bounds[columns[-1] + 1]]
+    offsets = starts - starts[0]
+    return columns, np.minimum.reduceat(segment, offsets), np.maximum.reduceat(segment, offsets)
+
+
+def history_capacity(freq, window_s, minimum=65536):
+    # Samples needed to fill the window at freq Hz, with room for a board running fast
+    return max(minimum, int(freq * window_s * 1.1) + 1) if freq else minimum
+
+
+class LivePlot(QWidget):
+    # Live position and velocity traces. Repaints are driven by a timer capped at
+    # max_fps and only happen when new samples arrived, independent of the sampling rate.
+
+    def __init__(self, window_s=10, max_fps=20, capacity=65536, freq=None, parent=None):
+        super().__init__(parent)
+        self.window_s = window_s
+        self.window_ns = int(window_s * 1e9)
+        self.min_capacity = capacity
+        self.history = HistoryBuffer(history_capacity(freq, window_s, capacity))
+        self.dirty = False
+        self.setMinimumHeight(160)
+
+        self.refreshTimer = QTimer(self)
+        self.refreshTimer.timeout.connect(self.refresh)
+        self.refreshTimer.start(int(1000 / max_fps))
+
+    def addSamples(self, times, positions):
+        self.history.extend(times, positions)
+        self.dirty = True
+
+    def clear(self, freq=None):
+        # Pass the sampling rate of the next session to size the history for the full window
+        capacity = history_capacity(freq, self.window_s, self.min_capacity)
+        if capacity != self.history.capacity:
+            self.history = HistoryBuffer(capacity)
+        else:
+            self.history.clear()
+        self.dirty = True
+
+    def refresh(self):
+        if self.dirty and self.isVisible():
+            self.dirty = False
+            self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor('black'))
+        times, positions, velocities = self.history.latest()
+        width = max(self.width(), 1)
+        half = self.height() // 2
+        if len(times):
+            t_start = int(times[-1]) - self.window_ns
+            self.drawTrace(painter, times, positions, t_start, width, 0, half, QColor('lime'), "Position")
+            self.drawTrace(painter, times, velocities, t_start, width, half, half, QColor('orange'), "Velocity")
+        painter.setPen(QPen(QColor('gray')))
+        painter.drawLine(0, half, width, half)
+        painter.end()
+
+    def drawTrace(self, painter, times, values, t_start, width, top, height, color, label):
+        columns, lows, highs = decimate_minmax(times, values, t_start, self.window_ns, width)
+        if len(columns) == 0:
+            return
+        vmin, vmax = float(lows.min()), float(highs.max())
+        scale = (height - 20) / (vmax - vmin) if vmax > vmin else 0.0
+
+        # Each column draws its min-max span, consecutive columns are joined
+        xs = np.repeat(columns, 2).astype(np.float64)
+        ys = top + height - 10 - (np.column_stack((lows, highs)).ravel() - vmin) * scale
+        points = QPolygonF([QPointF(x, y) for x, y in zip(xs.tolist(), ys.tolist())])
+        painter.setPen(QPen(color))
+        painter.drawPolyline(points)
+        painter.drawText(5, top + 15, f"{label}: {values[-1]:.1f}")
@@ -0,0 +1,90 @@
+import json
+import time
+
+
+class AcquisitionMetrics:
+    # Health counters for one acquisition stream.
+    # The sketch prints pos + count, so a missing line can't be told from a stationary
+    # wheel by value. Instead the number of expected samples follows from elapsed time
+    # and the firmware's trigger interval (1000 / freq ms, or the interval a TriggerClock
+    # fitted so the board's crystal drift doesn't count as loss); the shortfall is the
+    # number of samples that never made it. The clock's own gap detection is reported
+    # as detected_drops.
+
+    def __init__(self, freq, reader=None, buffer=None, writer=None, clock=None):
+        self.freq = freq
+        self.interval_ns = (1000 // int(freq)) * 1e6 if freq else None
+        self.reader = reader
+        self.buffer = buffer
+        self.writer = writer  # BackgroundWriter, for disk backpressure
+        self.clock = clock  # TriggerClock fed with the same arrivals, or None
+        self.started_ns = time.monotonic_ns()
+
+        self.received = 0
+        self.first_arrival_ns = None
+        self.last_arrival_ns = None
+        self.batches = 0
+        self.max_batch = 0  # Largest backlog drained at once, a proxy for ring buffer fill
+        self.loops = 0
+        self.loop_total_ns = 0
+        self.loop_max_ns = 0
+
+    def add_batch(self, arrivals_ns):
+        n = len(arrivals_ns)
+        if n == 0:
+            return
+        if self.first_arrival_ns is None:
+            self.first_arrival_ns = int(arrivals_ns[0])
+        self.last_arrival_ns = int(arrivals_ns[-1])
+        self.received += n
+        self.batches += 1
+        self.max_batch = max(self.max_batch, n)
+
+    def add_loop(self, duration_ns):
+        self.loops += 1
+        self.loop_total_ns += duration_ns
+        self.loop_max_ns = max(self.loop_max_ns, duration_ns)
+
+    @property
+    def expected(self):
+        interval_ns = self.clock.interval_ns if self.clock is not None else self.interval_ns
+        if self.first_arrival_ns is None or not interval_ns:
+            return self.received
+        return int(round((self.last_arrival_ns - self.first_arrival_ns) / interval_ns)) + 1
+
+    def snapshot(self):
+        expected = self.expected
+        snapshot = {
+            'elapsed_s': (time.monotonic_ns() - self.started_ns) / 1e9,
+            'received': self.received,
+            'expected': expected,
+            'missing': max(0, expected - self.received),
+            'detected_drops': self.clock.skipped if self.clock is not None else 0,
+            'ring_overruns': self.buffer.overruns if self.buffer is not None else 0,
+            'parse_errors': self.reader.parse_errors if self.reader is not None else 0,
+            'serial_high_water_bytes': self.reader.in_waiting_high_water if self.reader is not None else 0,
+            'max_batch': self.max_batch,
+            'loop_mean_ms': self.loop_total_ns / self.loops / 1e6 if self.loops else 0.0,
+            'loop_max_ms': self.loop_max_ns / 1e6,
+        }
+        if self.writer is not None:
+            snapshot.update(self.writer.stats())
+        return snapshot
+
+    def write_summary(self, path, timing=None):
+        summary = {'freq': self.freq, 'metrics': self.snapshot()}
+        if timing is not None:
+            summary['timing'] = timing
+        with open(path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+def format_snapshot(snapshot):
+    return (f"{snapshot['received']}/{snapshot['expected']} samples ({snapshot['missing']} missing, "
+            f"{snapshot['detected_drops']} dropped lines detected), "
+            f"{snapshot['parse_errors']} parse errors, {snapshot['ring_overruns']} overruns, "
+            f"serial high water {snapshot['serial_high_water_bytes']} B, "
+            f"loop {snapshot['loop_mean_ms']:.2f}/{snapshot['loop_max_ms']:.2f} ms (mean/max)" +
+            (f", writer queue {snapshot['writer_queue_high_water']} peak, {snapshot['writer_stalls']} stalls "
+             f"({snapshot['writer_stall_ms']:.1f} ms)" if 'writer_stalls' in snapshot else ""))
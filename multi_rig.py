@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+
+from encoder_reader import EncoderReader
+from clock_sync import MonotonicClock
+from metrics import format_snapshot
+
+
+def parse_rig_spec(spec, default_freq, data_dir, formatted_timestamp, fmt):
+    # PORT[:FREQ[:OUTPUT]], e.g. /dev/ttyACM0:100 or COM5:50:C:\data\rig1.csv
+    parts = spec.split(':', 2)
+    port_name = parts[0]
+    freq = int(parts[1]) if len(parts) > 1 and parts[1] else default_freq
+    if len(parts) > 2 and parts[2]:
+        file_path = parts[2]
+    else:
+        file_path = os.path.join(data_dir, f"serial_data_{os.path.basename(port_name)}_{formatted_timestamp}.{fmt}")
+    return {'port': port_name, 'freq': freq, 'output': file_path}
+
+
+def record(rig_specs, timer=0, buffer_size=65536):
+    # All readers stamp against one shared monotonic clock and wake a single
+    # consumer through a shared event, so no thread ever sleeps in a polling loop
+    clock = MonotonicClock()
+    data_event = threading.Event()
+    rigs = [EncoderReader(spec['port'], spec['freq'], spec['output'], buffer_size=buffer_size, clock=clock,
+                          data_event=data_event) for spec in rig_specs]
+    started = []
+    start_time = time.monotonic()
+    try:
+        for rig in rigs:
+            rig.start()
+            started.append(rig)
+        while True:
+            remaining = timer - (time.monotonic() - start_time) if timer else None
+            if remaining is not None and remaining <= 0:
+                break
+            data_event.wait(timeout=0.5 if remaining is None else min(remaining, 0.5))
+            data_event.clear()
+            for rig in rigs:
+                rig.process()
+    except KeyboardInterrupt:
+        print("Data recording stopped by user.")
+    finally:
+        # Stop every rig that started, even if another one fails to stop
+        for rig in started:
+            try:
+                rig.stop()
+            except Exception as e:
+                print(f"{rig.port_name}: ERROR {e}")
+            summary = rig.summary
+            if summary is None:
+                continue
+            print(f"{rig.port_name}: {rig.counter} cycles recorded to {rig.output}, "
+                  f"jitter {summary['timing']['jitter_std_ms']:.3f} ms (std).")
+            print(f"{rig.port_name}: {format_snapshot(summary['metrics'])}")
+            if rig.buffer.overruns:
+                print(f"Warning: {rig.port_name} ring buffer overran, {rig.buffer.overruns} samples lost.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record several encoder boards from one process.")
+    parser.add_argument("rigs", type=str, nargs='*', help="PORT[:FREQ[:OUTPUT]] for each rig.")
+    parser.add_argument("--config", type=str, default=None, help="JSON list of {\"port\", \"freq\", \"output\"} objects.")
+    parser.add_argument("--freq", type=int, default=20, help="Default frequency in Hz.")
+    parser.add_argument("--timer", type=int, default=0, help="Set timer in sec.")
+    parser.add_argument("--format", type=str, default="csv", choices=["csv", "npy", "npz", "h5", "parquet", "session", "archive"], help="Default output file format.")
+    parser.add_argument("--buffer_size", type=int, default=65536, help="Ring buffer capacity in samples per rig.")
+    args = parser.parse_args()
+
+    formatted_timestamp = datetime.now().strftime("%Y_%m_%d_%H_%M_%S.%f")[:-3]
+    data_dir = os.path.join(os.path.expanduser("~"), "Documents", "serial_data")
+    os.makedirs(data_dir, exist_ok=True)
+
+    specs = [parse_rig_spec(spec, args.freq, data_dir, formatted_timestamp, args.format) for spec in args.rigs]
+    if args.config:
+        with open(args.config, 'r') as file:
+            for entry in json.load(file):
+                spec = parse_rig_spec(entry['port'], args.freq, data_dir, formatted_timestamp, args.format)
+                spec.update({key: entry[key] for key in ('freq', 'output') if key in entry})
+                specs.append(spec)
+    if not specs:
+        parser.error("No rigs given.")
+
+    record(specs, args.timer, args.buffer_size)
+    print("Serial data recording complete.")
@@ -0,0 +1,250 @@
+import os
+import time
+import socket
+import argparse
+import numpy as np
+from urllib.parse import urlparse
+from multiprocessing import shared_memory, resource_tracker
+
+# Live sample message layout (all little-endian):
+#
+# UDP datagram = MESSAGE_HEADER followed by `count` SAMPLE records
+#   MESSAGE_HEADER (20 bytes)
+#     magic       4s   b'ENCP'
+#     version     u2   1
+#     count       u2   number of records that follow
+#     seq         u4   datagram sequence number, gaps mean lost datagrams
+#     publish_ns  i8   perf_counter_ns() when the datagram was sent
+#   SAMPLE (32 bytes)
+#     counter     i8   sample counter, as recorded
+#     timestamp_ns i8  de-jittered sample time, ns since the epoch
+#     arrival_ns  i8   perf_counter_ns() when the reader got the bytes off the port
+#     position    i8   wheel position relative to the first sample of the session, with
+#                      the board's one count per trigger (counter) already taken out
+#
+# Shared memory ring = RING_HEADER (64 bytes) followed by `capacity` SAMPLE records
+#   RING_HEADER
+#     magic       8s   b'ENCRING1'
+#     capacity    u8   number of record slots
+#     write_index u8   total records ever written, slot = index % capacity
+#
+# perf_counter_ns() is CLOCK_MONOTONIC on Linux, so subscribers on the same machine
+# can compare arrival_ns with their own perf_counter_ns() to get end-to-end latency.
+MAGIC = b'ENCP'
+VERSION = 1
+RING_MAGIC = b'ENCRING1'
+RING_HEADER_SIZE = 64
+
+MESSAGE_HEADER = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('count', '<u2'),
+    ('seq', '<u4'),
+    ('publish_ns', '<i8'),
+])
+SAMPLE = np.dtype([
+    ('counter', '<i8'),
+    ('timestamp_ns', '<i8'),
+    ('arrival_ns', '<i8'),
+    ('position', '<i8'),
+])
+RING_HEADER = np.dtype([
+    ('magic', 'S8'),
+    ('capacity', '<u8'),
+    ('write_index', '<u8'),
+])
+
+MAX_DATAGRAM_SAMPLES = 1024  # Keeps datagrams well under the 64 KB UDP limit
+
+
+def make_samples(counters, timestamps_ns, arrivals_ns, positions):
+    samples = np.empty(len(positions), dtype=SAMPLE)
+    samples['counter'] = counters
+    samples['timestamp_ns'] = timestamps_ns
+    samples['arrival_ns'] = arrivals_ns
+    samples['position'] = positions
+    return samples
+
+
+class UDPPublisher:
+    # Sends each micro-batch as one or more datagrams. Fire and forget, a slow or
+    # missing subscriber never blocks acquisition.
+
+    def __init__(self, host='127.0.0.1', port=5555):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.seq = 0
+        self.dropped = 0  # Datagrams the OS refused to queue
+
+    def publish(self, samples):
+        for start in range(0, len(samples), MAX_DATAGRAM_SAMPLES):
+            chunk = samples[start:start + MAX_DATAGRAM_SAMPLES]
+            header = np.zeros(1, dtype=MESSAGE_HEADER)
+            header['magic'] = MAGIC
+            header['version'] = VERSION
+            header['count'] = len(chunk)
+            header['seq'] = self.seq & 0xFFFFFFFF
+            header['publish_ns'] = time.perf_counter_ns()
+            self.seq += 1
+            try:
+                self.sock.sendto(header.tobytes() + chunk.tobytes(), self.address)
+            except (BlockingIOError, ConnectionRefusedError):
+                self.dropped += 1
+
+    def close(self):
+        self.sock.close()
+
+
+class UDPSubscriber:
+    def __init__(self, host='127.0.0.1', port=5555):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.settimeout(0.5)
+        self.last_seq = None
+        self.lost_datagrams = 0
+
+    def receive(self):
+        # Block for the next datagram, returns its SAMPLE records (empty on timeout)
+        try:
+            data = self.sock.recv(65536)
+        except socket.timeout:
+            return np.empty(0, dtype=SAMPLE)
+        header = np.frombuffer(data[:MESSAGE_HEADER.itemsize], dtype=MESSAGE_HEADER)[0]
+        if header['magic'] != MAGIC or header['version'] != VERSION:
+            return np.empty(0, dtype=SAMPLE)
+        seq = int(header['seq'])
+        if self.last_seq is not None and seq != (self.last_seq + 1) & 0xFFFFFFFF:
+            self.lost_datagrams += (seq - self.last_seq - 1) & 0xFFFFFFFF
+        self.last_seq = seq
+        return np.frombuffer(data, dtype=SAMPLE, count=int(header['count']), offset=MESSAGE_HEADER.itemsize)
+
+    def close(self):
+        self.sock.close()
+
+
+class ShmPublisher:
+    # Single-writer ring in named shared memory. Records are written first and
+    # write_index is bumped afterwards, so readers never see a half-written batch.
+
+    def __init__(self, name='encoder', capacity=65536):
+        self.capacity = capacity
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=RING_HEADER_SIZE + capacity * SAMPLE.itemsize)
+        self.header = np.ndarray(1, dtype=RING_HEADER, buffer=self.shm.buf)
+        self.records = np.ndarray(capacity, dtype=SAMPLE, buffer=self.shm.buf, offset=RING_HEADER_SIZE)
+        self.header['magic'] = RING_MAGIC
+        self.header['capacity'] = capacity
+        self.header['write_index'] = 0
+        self.write_index = 0
+
+    def publish(self, samples):
+        # A batch larger than the ring keeps its tail, the index still counts every record
+        self.write_index += len(samples) - len(samples[-self.capacity:])
+        samples = samples[-self.capacity:]
+        idx = (self.write_index + np.arange(len(samples))) % self.capacity
+        self.records[idx] = samples
+        self.write_index += len(samples)
+        self.header['write_index'] = self.write_index
+
+    def close(self):
+        del self.header, self.records
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ShmSubscriber:
+    def __init__(self, name='encoder'):
+        # Attaching must not make this process unlink the publisher's segment on exit
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13 registers every attached segment, POSIX names carry a leading slash
+            self.shm = shared_memory.SharedMemory(name=name)
+            if os.name == 'posix':
+                resource_tracker.unregister('/' + self.shm.name, 'shared_memory')
+        self.header = np.ndarray(1, dtype=RING_HEADER, buffer=self.shm.buf)
+        if self.header['magic'][0] != RING_MAGIC:
+            raise ValueError(f"{name} is not an encoder sample ring.")
+        self.capacity = int(self.header['capacity'][0])
+        self.records = np.ndarray(self.capacity, dtype=SAMPLE, buffer=self.shm.buf, offset=RING_HEADER_SIZE)
+        self.read_index = int(self.header['write_index'][0])  # Start from the live edge
+        self.overruns = 0
+
+    def receive(self, timeout=0.5, poll_interval=0.0005):
+        # Wait up to timeout s (None = forever) for new records and return a copy of
+        # them, empty on timeout like UDPSubscriber
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            end = int(self.header['write_index'][0])
+            if end != self.read_index:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                return np.empty(0, dtype=SAMPLE)
+            time.sleep(poll_interval)
+        start = self.read_index
+        if end - start > self.capacity:
+            self.overruns += end - start - self.capacity
+            start = end - self.capacity
+        samples = self.records[np.arange(start, end) % self.capacity]
+        # Drop anything the publisher overwrote while we copied
+        lapped = int(self.header['write_index'][0]) - self.capacity - start
+        if lapped > 0:
+            self.overruns += min(lapped, end - start)
+            samples = samples[lapped:]
+        self.read_index = end
+        return samples
+
+    def close(self):
+        del self.header, self.records
+        self.shm.close()
+
+
+def open_publisher(url):
+    # udp://host:port or shm://name
+    parsed = urlparse(url)
+    if parsed.scheme == 'udp':
+        return UDPPublisher(parsed.hostname or '127.0.0.1', parsed.port or 5555)
+    if parsed.scheme == 'shm':
+        return ShmPublisher(parsed.netloc or 'encoder')
+    raise ValueError(f"Unsupported publish URL: {url}")
+
+
+def open_subscriber(url):
+    parsed = urlparse(url)
+    if parsed.scheme == 'udp':
+        return UDPSubscriber(parsed.hostname or '127.0.0.1', parsed.port or 5555)
+    if parsed.scheme == 'shm':
+        return ShmSubscriber(parsed.netloc or 'encoder')
+    raise ValueError(f"Unsupported subscribe URL: {url}")
+
+
+if __name__ == "__main__":
+    # Test subscriber: prints the latest position and the serial-arrival-to-subscriber latency
+    parser = argparse.ArgumentParser(description="Subscribe to live encoder samples.")
+    parser.add_argument("url", type=str, nargs='?', default="udp://127.0.0.1:5555", help="udp://host:port or shm://name")
+    parser.add_argument("--interval", type=float, default=1.0, help="Report interval in sec.")
+    args = parser.parse_args()
+
+    subscriber = open_subscriber(args.url)
+    latencies = []
+    received = 0
+    last_report = time.monotonic()
+    last_position = None
+    try:
+        while True:
+            samples = subscriber.receive()
+            now = time.perf_counter_ns()
+            if len(samples):
+                received += len(samples)
+                latencies.append((now - samples['arrival_ns']) / 1e6)
+                last_position = int(samples['position'][-1])
+            if time.monotonic() - last_report >= args.interval:
+                if latencies:
+                    p50, p99, pmax = np.percentile(np.concatenate(latencies), [50, 99, 100])
+                    print(f"{received} samples, position {last_position}, latency p50={p50:.3f} p99={p99:.3f} max={pmax:.3f} ms")
+                latencies = []
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        subscriber.close()
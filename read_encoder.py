@@ -1,94 +1,105 @@
 import os
-import numpy as np
-import serial
-import csv
 import time
+import numpy as np
 from datetime import datetime
 import argparse
-
-# Set the system arguments
-parser = argparse.ArgumentParser(description="Serial communication.")
-parser.add_argument("port_name", type=str, help="Port name.")
-parser.add_argument("--freq", type=int, default=20, help="Frequency in Hz.")
-parser.add_argument("--timer", type=int, default=0, help="Set timer in sec.")
-parser.add_argument('--verbose', action='store_true', default=False)
-# Parse the system arguments
-args = parser.parse_args()
-port_name = args.port_name
-freq = args.freq
-timer = args.timer
-
-# Configure the serial port and baud rate
-SERIAL_PORT = f'{port_name}'
-BAUD_RATE = 115200 
-
-# CSV file
-current_timestamp = datetime.now()
-formatted_timestamp = current_timestamp.strftime("%Y_%m_%d_%H_%M_%S.%f")[:-3]
-user_dir = os.path.expanduser("~")
-data_dir = fr"{user_dir}\\Documents\\serial_data"
-os.makedirs(data_dir, exist_ok=True)
-file_path = fr'{data_dir}\\serial_data_{formatted_timestamp}.csv'
-
-def read_serial_data():
-    # Open the serial connection
-    with serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1) as ser:
-        ser.write(f"A {freq}\n".encode())
-        time.sleep(0.01) # Delay the start to give the mcu time to process
-        ser.write("S\n".encode())
-
-        # Open the CSV file
-        with open(file_path, mode='w', newline='') as file:
-            writer = csv.writer(file)
-
-            last_timestamp = None 
-            last_pos = 0 # Use this to offset the position
-            counter = 0 # Count the cycles
-
-            try:
-                current_timestamp = datetime.now()
-                formatted_timestamp = current_timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                writer.writerow(['Started recording:', formatted_timestamp, f"at {freq} Hz"])
-                writer.writerow(['Counter','Timestamp', 'Period', 'Position'])
-                while True:
-                    counter = counter + 1
-
-                    # Read the data from the seril
-                    pos = int(ser.readline().decode('utf-8').strip())
-                    if counter==1:
-                        last_pos = pos
-
-                    # Check if there's data
-                    if pos:
-                        # Get the current timestamp
-                        current_timestamp = datetime.now()
-
-                        # Calculate time difference
-                        if last_timestamp is not None:
-                            time_diff = np.round((current_timestamp - last_timestamp).total_seconds() * 1000, 2)
-                        else:
-                            time_diff = 0
-
-                        # Update last timestamp
-                        last_timestamp = current_timestamp
-                        # Offset the position
-                        pos = pos - last_pos
-
-                        # Format the current timestamp
-                        formatted_timestamp = current_timestamp.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-
-                        # Write the cycle number, timestamp, time difference, and data to the CSV file
-                        writer.writerow([counter, formatted_timestamp, time_diff, pos])
-                        if args.verbose: print(f"{counter}-> (Δt={time_diff} ms): {pos}")
-
-                    # Sleep for a very short period so nothing gets too overwhelmed
-                    time.sleep(0.001)
-
-            except KeyboardInterrupt:
-                # Terminate gracefully and let the user know
-                ser.write("E\n".encode())
-                print(f"Data recording stopped by user. {counter} cycles recorded.")
+from encoder_reader import EncoderReader
+from metrics import format_snapshot
+from bout_detector import BoutDetector, ONSET
+
+def parse_args(argv=None):
+    # Set the system arguments
+    parser = argparse.ArgumentParser(description="Serial communication.")
+    parser.add_argument("port_name", type=str, help="Port name.")
+    parser.add_argument("--freq", type=int, default=20, help="Frequency in Hz.")
+    parser.add_argument("--timer", type=int, default=0, help="Set timer in sec.")
+    parser.add_argument("--buffer_size", type=int, default=65536, help="Ring buffer capacity in samples.")
+    parser.add_argument("--format", type=str, default="csv", choices=["csv", "npy", "npz", "h5", "parquet", "session", "archive"], help="Output file format.")
+    parser.add_argument("--raw_timestamps", action='store_true', default=False, help="Record host arrival times instead of de-jittered trigger times.")
+    parser.add_argument("--publish", type=str, default=None, help="Publish live samples to udp://host:port or shm://name.")
+    parser.add_argument("--flush_interval", type=float, default=1.0, help="Flush the output file every N sec.")
+    parser.add_argument("--fsync", action='store_true', default=False, help="Also fsync the output file on every flush.")
+    parser.add_argument("--segment_minutes", type=float, default=0, help="Start a new numbered output file every N min (0 = one file).")
+    parser.add_argument("--segment_samples", type=int, default=0, help="Start a new numbered output file every N samples (0 = no limit).")
+    parser.add_argument("--bout_onset", type=float, default=0, help="Detect running bouts starting at this speed in counts/s (0 = off).")
+    parser.add_argument("--bout_offset", type=float, default=None, help="Speed in counts/s below which a bout ends (default onset / 2).")
+    parser.add_argument("--bout_window", type=float, default=0.25, help="Velocity smoothing window in sec.")
+    parser.add_argument("--metrics_interval", type=float, default=0, help="Print acquisition health every N sec (0 = off).")
+    parser.add_argument('--verbose', action='store_true', default=False)
+    # Parse the system arguments
+    return parser.parse_args(argv)
+
+def default_file_path(fmt):
+    # Saves under ~/Documents/serial_data, named after the start time
+    current_timestamp = datetime.now()
+    formatted_timestamp = current_timestamp.strftime("%Y_%m_%d_%H_%M_%S.%f")[:-3]
+    user_dir = os.path.expanduser("~")
+    data_dir = os.path.join(user_dir, "Documents", "serial_data")
+    os.makedirs(data_dir, exist_ok=True)
+    return os.path.join(data_dir, f"serial_data_{formatted_timestamp}.{fmt}")
+
+def print_samples(chunk, state):
+    # Verbose output, one line per sample
+    times = chunk['timestamp_ns']
+    prev = times[0] if state['last_time_ns'] is None else state['last_time_ns']
+    time_diffs = np.round(np.diff(times, prepend=prev) / 1e6, 2)
+    state['last_time_ns'] = int(times[-1])
+    for counter, time_diff, pos in zip(chunk['counter'].tolist(), time_diffs.tolist(), chunk['position'].tolist()):
+        print(f"{counter}-> (Δt={time_diff} ms): {pos}")
+
+def print_events(events):
+    for kind, counter, velocity in zip(events['kind'].tolist(), events['counter'].tolist(), events['velocity'].tolist()):
+        print(f"{'Running' if kind == ONSET else 'Stopped'} at sample {counter} ({velocity:.1f} counts/s)")
+
+def read_serial_data(args):
+    bout_detector = None
+    if args.bout_onset:
+        bout_detector = BoutDetector(args.freq, args.bout_onset, args.bout_offset, args.bout_window)
+    reader = EncoderReader(args.port_name, args.freq, default_file_path(args.format), buffer_size=args.buffer_size,
+                           raw_timestamps=args.raw_timestamps, publish=args.publish, flush_interval=args.flush_interval,
+                           fsync=args.fsync, segment_s=args.segment_minutes * 60 or None,
+                           segment_records=args.segment_samples or None, bout_detector=bout_detector)
+    if args.verbose:
+        state = {'last_time_ns': None}
+        reader.add_callback(lambda chunk: print_samples(chunk, state))
+    if bout_detector is not None:
+        reader.add_event_callback(print_events)
+
+    reader.start()
+    start_time = time.monotonic()
+    last_report = start_time
+    try:
+        while True:
+            if args.timer and time.monotonic() - start_time >= args.timer:
+                break
+            reader.read()
+            if args.metrics_interval and time.monotonic() - last_report >= args.metrics_interval:
+                print(format_snapshot(reader.metrics.snapshot()))
+                last_report = time.monotonic()
+
+    except KeyboardInterrupt:
+        # Terminate gracefully and let the user know
+        print("Data recording stopped by user.")
+    finally:
+        try:
+            reader.stop()
+        finally:
+            # Report what was saved even if the port failed
+            print_summary(reader, bout_detector)
+
+def print_summary(reader, bout_detector=None):
+    summary = reader.summary
+    print(f"{reader.counter} cycles recorded.")
+    if reader.buffer.overruns:
+        print(f"Warning: ring buffer overran, {reader.buffer.overruns} samples lost.")
+    if reader.reader.parse_errors:
+        print(f"Warning: {reader.reader.parse_errors} unparseable lines skipped.")
+    timing = summary['timing']
+    print(format_snapshot(summary['metrics']))
+    if bout_detector is not None:
+        print(f"{bout_detector.bouts} running bouts detected.")
+    print(f"Timing: interval {timing['interval_ms']:.4f} ms, jitter {timing['jitter_std_ms']:.3f} ms (std).")
 
 if __name__ == "__main__":
-    read_serial_data()
+    read_serial_data(parse_args())
     print("Serial data recording complete.")
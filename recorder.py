@@ -0,0 +1,466 @@
+import os
+import csv
+import time
+import json
+import queue
+import threading
+import numpy as np
+from datetime import datetime
+from session_file import RECORD_DTYPE, SessionWriter
+from archive_file import ArchiveWriter
+
+# Optional backends, only available when the libraries are installed
+try:
+    import h5py
+except ImportError:
+    h5py = None
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+def format_timestamps(timestamps_ns, digits=3):
+    # Vectorized local-time formatting of int64 ns timestamps as "YYYY-mm-dd HH:MM:SS.fff".
+    # The UTC offset is looked up once per distinct second, so a batch spanning a
+    # daylight saving change is formatted correctly on both sides of it.
+    if len(timestamps_ns) == 0:
+        return []
+    timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+    seconds, inverse = np.unique(timestamps_ns // 1_000_000_000, return_inverse=True)
+    utc_offsets_ns = np.array([time.localtime(s).tm_gmtoff for s in seconds.tolist()], dtype=np.int64) * 1_000_000_000
+    local = (timestamps_ns + utc_offsets_ns[inverse]).astype('datetime64[ns]')
+    unit = {0: 's', 3: 'ms', 6: 'us', 9: 'ns'}[digits]
+    return [s.replace('T', ' ') for s in np.datetime_as_string(local, unit=unit).tolist()]
+
+
+class CSVBackend:
+    # Text output in one of the two existing layouts:
+    # 'cli' is what read_encoder.py writes (two header rows, period in ms),
+    # 'gui' is what SerialApp writes (Frame/Timestamp/Timestep/Position, timestep in s).
+
+    def __init__(self, path, metadata=None, layout='cli'):
+        self.path = path
+        self.layout = layout
+        self.file = open(path, mode='w', newline='')
+        self.writer = csv.writer(self.file)
+        metadata = metadata or {}
+        if layout == 'cli':
+            start_time = datetime.fromtimestamp(metadata.get('start_time_ns', time.time_ns()) / 1e9)
+            formatted_timestamp = start_time.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+            self.writer.writerow(['Started recording:', formatted_timestamp, f"at {metadata.get('freq')} Hz"])
+            self.writer.writerow(['Counter', 'Timestamp', 'Period', 'Position'])
+        elif layout == 'gui':
+            self.writer.writerow(['Frame', 'Timestamp', 'Timestep', 'Position'])
+        else:
+            raise ValueError(f"Unknown CSV layout: {layout}")
+
+    def write(self, records):
+        if self.layout == 'cli':
+            timestamps = format_timestamps(records['timestamp_ns'], digits=3)
+            periods = np.round(records['period_ms'], 2).tolist()
+        else:
+            timestamps = format_timestamps(records['timestamp_ns'], digits=6)
+            periods = (records['period_ms'] / 1000).tolist()
+        self.writer.writerows(zip(records['counter'].tolist(), timestamps, periods, records['position'].tolist()))
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class NpyBackend:
+    # Structured .npy file of RECORD_DTYPE records, appended in place. The header is
+    # rewritten with the current length on every flush and on close, so after a crash
+    # np.load() returns everything up to the last flush.
+    HEADER_LEN = 256
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.count = 0
+        self.file = open(path, mode='wb')
+        self._write_header()
+        if metadata:
+            with open(path + '.json', 'w') as f:
+                json.dump(metadata, f)
+
+    def _write_header(self):
+        # Fixed-length header so rewriting it with the final count never shifts the data
+        self.file.seek(0)
+        self.file.write(_npy_header_bytes(self.count, self.HEADER_LEN))
+        self.file.seek(0, os.SEEK_END)
+
+    def write(self, records):
+        self.file.write(records.tobytes())
+        self.count += len(records)
+
+    def flush(self):
+        # Data first, then the header that counts it, so the header never claims
+        # records that aren't in the file yet
+        self.file.flush()
+        self._write_header()
+        self.file.flush()
+
+    def close(self):
+        self._write_header()
+        self.file.close()
+
+
+def _npy_header_bytes(count, total_len):
+    # Version 1.0 .npy header for `count` records, padded to exactly total_len bytes
+    text = repr({'descr': np.lib.format.dtype_to_descr(RECORD_DTYPE),
+                 'fortran_order': False,
+                 'shape': (count,)}).encode('latin1')
+    pad = total_len - 10 - len(text) - 1
+    return b'\x93NUMPY\x01\x00' + (total_len - 10).to_bytes(2, 'little') + text + b' ' * pad + b'\n'
+
+
+class NpzBackend:
+    # Column-per-array .npz archive. Chunks are kept in memory and written on close, so
+    # flushing doesn't apply: a crash loses the whole recording and memory grows with
+    # the session. Use .npy, .session or .archive for long or unattended recordings.
+
+    def __init__(self, path, metadata=None):
+        self.path = path
+        self.metadata = metadata or {}
+        self.chunks = []
+
+    def write(self, records):
+        self.chunks.append(records.copy())
+
+    def flush(self):
+        pass
+
+    def close(self):
+        records = np.concatenate(self.chunks) if self.chunks else np.empty(0, dtype=RECORD_DTYPE)
+        columns = {name: records[name] for name in RECORD_DTYPE.names}
+        np.savez(self.path, metadata=json.dumps(self.metadata), **columns)
+        self.chunks = []
+
+
+class HDF5Backend:
+    # One resizable dataset per column, metadata stored as file attributes. Requires h5py.
+
+    def __init__(self, path, metadata=None):
+        if h5py is None:
+            raise ImportError("h5py is required for HDF5 output.")
+        self.path = path
+        self.file = h5py.File(path, 'w')
+        for key, value in (metadata or {}).items():
+            self.file.attrs[key] = value
+        self.datasets = {
+            name: self.file.create_dataset(name, shape=(0,), maxshape=(None,), dtype=RECORD_DTYPE[name], chunks=True)
+            for name in RECORD_DTYPE.names
+        }
+
+    def write(self, records):
+        for name, dataset in self.datasets.items():
+            n = dataset.shape[0]
+            dataset.resize((n + len(records),))
+            dataset[n:] = records[name]
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetBackend:
+    # One row group per flushed chunk. Requires pyarrow.
+
+    def __init__(self, path, metadata=None):
+        if pq is None:
+            raise ImportError("pyarrow is required for Parquet output.")
+        self.path = path
+        schema = pa.schema([(name, pa.from_numpy_dtype(RECORD_DTYPE[name])) for name in RECORD_DTYPE.names])
+        schema = schema.with_metadata({key: str(value) for key, value in (metadata or {}).items()})
+        self.writer = pq.ParquetWriter(path, schema)
+
+    def write(self, records):
+        self.writer.write_table(pa.table({name: records[name] for name in RECORD_DTYPE.names}, schema=self.writer.schema))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.writer.close()
+
+
+BACKENDS = {
+    '.csv': CSVBackend,
+    '.npy': NpyBackend,
+    '.npz': NpzBackend,
+    '.h5': HDF5Backend,
+    '.hdf5': HDF5Backend,
+    '.parquet': ParquetBackend,
+    '.session': SessionWriter,
+    '.archive': ArchiveWriter,
+}
+
+
+def open_backend(path, metadata=None, **kwargs):
+    # Pick the backend from the file extension
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in BACKENDS:
+        raise ValueError(f"Unsupported output format: {ext}")
+    return BACKENDS[ext](path, metadata=metadata, **kwargs)
+
+
+def sync_backend(backend):
+    # Flush a backend and push its file to disk, where the backend has one
+    backend.flush()
+    f = getattr(backend, 'file', None)
+    if f is not None and hasattr(f, 'fileno'):
+        os.fsync(f.fileno())
+
+
+class RotatingBackend:
+    # Splits one recording into numbered segment files (run_0001.csv, run_0002.csv, ...)
+    # once a segment spans segment_s seconds of sample time or holds segment_records
+    # records. Every segment is a complete file of the underlying format.
+
+    def __init__(self, path, metadata=None, segment_s=None, segment_records=None, **kwargs):
+        if not segment_s and not segment_records:
+            raise ValueError("RotatingBackend needs segment_s or segment_records.")
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self.segment_ns = int(segment_s * 1e9) if segment_s else None
+        self.segment_records = segment_records
+        self.kwargs = kwargs
+        self.segment = 0
+        self.paths = []
+        self.backend = None
+        self.count = 0  # Records in the current segment
+        self.segment_start_ns = None
+
+    @property
+    def file(self):
+        return getattr(self.backend, 'file', None)
+
+    def segment_path(self, index):
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}_{index:04d}{ext}"
+
+    def _rotate(self, start_ns):
+        if self.backend is not None:
+            self.backend.close()
+        self.segment += 1
+        metadata = dict(self.metadata, start_time_ns=int(start_ns), segment=self.segment)
+        path = self.segment_path(self.segment)
+        self.backend = open_backend(path, metadata, **self.kwargs)
+        self.paths.append(path)
+        self.count = 0
+        self.segment_start_ns = int(start_ns)
+
+    def write(self, records):
+        start = 0
+        while start < len(records):
+            first_ns = int(records['timestamp_ns'][start])
+            if (self.backend is None or
+                    (self.segment_records and self.count >= self.segment_records) or
+                    (self.segment_ns and first_ns - self.segment_start_ns >= self.segment_ns)):
+                self._rotate(first_ns)
+            # Take records up to whichever segment limit comes first
+            stop = len(records)
+            if self.segment_records:
+                stop = min(stop, start + self.segment_records - self.count)
+            if self.segment_ns:
+                end_ns = self.segment_start_ns + self.segment_ns
+                stop = min(stop, start + max(1, int(np.searchsorted(records['timestamp_ns'][start:stop], end_ns))))
+            self.backend.write(records[start:stop])
+            self.count += stop - start
+            start = stop
+
+    def flush(self):
+        if self.backend is not None:
+            self.backend.flush()
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
+
+
+class BackgroundWriter:
+    # Wraps a backend so writes happen on a separate thread. write() only queues a
+    # copy of the records; a slow disk fills the bounded queue and, once it is full,
+    # makes write() wait. Those waits are counted as stalls (backpressure).
+    # The writer thread flushes (and optionally fsyncs) every sync_interval seconds
+    # or sync_bytes bytes, whichever comes first, so a crash loses at most that much.
+
+    def __init__(self, backend, max_queue=64, sync_interval=1.0, sync_bytes=None, fsync=False):
+        self.backend = backend
+        self.path = getattr(backend, 'path', None)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.sync_interval = sync_interval
+        self.sync_bytes = sync_bytes
+        self.fsync = fsync
+        self.error = None
+
+        self.queue_high_water = 0
+        self.stalls = 0
+        self.stall_total_ns = 0
+        self.stall_max_ns = 0
+        self.write_max_ns = 0
+        self.syncs = 0
+        self.bytes_written = 0
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, records):
+        self._check()
+        item = records.copy()
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            start = time.perf_counter_ns()
+            self.queue.put(item)
+            waited = time.perf_counter_ns() - start
+            self.stalls += 1
+            self.stall_total_ns += waited
+            self.stall_max_ns = max(self.stall_max_ns, waited)
+        self.queue_high_water = max(self.queue_high_water, self.queue.qsize())
+
+    def flush(self):
+        # Syncing is driven by the writer thread, so there is nothing to wait for here
+        self._check()
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self._check()
+
+    def _check(self):
+        if self.error is not None:
+            raise self.error
+
+    def _run(self):
+        last_sync = time.monotonic()
+        unsynced = 0
+        while True:
+            try:
+                item = self.queue.get(timeout=self.sync_interval or None)
+            except queue.Empty:
+                item = False
+            try:
+                if item is None:
+                    self._sync()
+                    self.backend.close()
+                    return
+                if item is not False:
+                    start = time.perf_counter_ns()
+                    self.backend.write(item)
+                    self.write_max_ns = max(self.write_max_ns, time.perf_counter_ns() - start)
+                    self.bytes_written += item.nbytes
+                    unsynced += item.nbytes
+                if unsynced and ((self.sync_interval and time.monotonic() - last_sync >= self.sync_interval) or
+                                 (self.sync_bytes and unsynced >= self.sync_bytes)):
+                    self._sync()
+                    last_sync = time.monotonic()
+                    unsynced = 0
+            except Exception as e:
+                # Keep draining so producers never block on a dead writer, and
+                # report the error on their next call
+                if self.error is None:
+                    self.error = e
+                if item is None:
+                    return
+
+    def _sync(self):
+        if self.fsync:
+            sync_backend(self.backend)
+        else:
+            self.backend.flush()
+        self.syncs += 1
+
+    def stats(self):
+        return {
+            'writer_queue': self.queue.qsize(),
+            'writer_queue_high_water': self.queue_high_water,
+            'writer_stalls': self.stalls,
+            'writer_stall_ms': self.stall_total_ns / 1e6,
+            'writer_stall_max_ms': self.stall_max_ns / 1e6,
+            'writer_write_max_ms': self.write_max_ns / 1e6,
+            'writer_syncs': self.syncs,
+        }
+
+
+class Recorder:
+    # Accumulates samples into a preallocated record array and hands them to the
+    # backend one chunk at a time, so per-sample work is just an array store.
+
+    def __init__(self, backend, chunk_size=4096, last_timestamp_ns=None, flush_interval=None):
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval  # Also hand over partial chunks this often (s)
+        self.last_flush = time.monotonic()
+        self.records = np.zeros(chunk_size, dtype=RECORD_DTYPE)
+        self.n = 0  # Samples waiting in the current chunk
+        self.counter = 0  # Samples recorded so far
+        self.last_timestamp_ns = last_timestamp_ns
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, timestamp_ns, position, counter=None):
+        self.counter = self.counter + 1 if counter is None else counter
+        if self.last_timestamp_ns is not None:
+            period = (timestamp_ns - self.last_timestamp_ns) / 1e6
+        else:
+            period = 0
+        self.last_timestamp_ns = timestamp_ns
+        self.records[self.n] = (self.counter, timestamp_ns, period, position)
+        self.n += 1
+        if self.n == self.chunk_size or self._flush_due():
+            self.flush()
+
+    def extend(self, timestamps_ns, positions, counters=None):
+        # Vectorized append of a whole batch
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) == 0:
+            return
+        if counters is None:
+            counters = np.arange(self.counter + 1, self.counter + 1 + len(positions), dtype=np.int64)
+        periods = np.empty(len(timestamps_ns), dtype=np.float64)
+        periods[1:] = np.diff(timestamps_ns) / 1e6
+        periods[0] = 0 if self.last_timestamp_ns is None else (timestamps_ns[0] - self.last_timestamp_ns) / 1e6
+        self.counter = int(counters[-1])
+        self.last_timestamp_ns = int(timestamps_ns[-1])
+
+        start = 0
+        while start < len(positions):
+            take = min(self.chunk_size - self.n, len(positions) - start)
+            chunk = self.records[self.n:self.n + take]
+            chunk['counter'] = counters[start:start + take]
+            chunk['timestamp_ns'] = timestamps_ns[start:start + take]
+            chunk['period_ms'] = periods[start:start + take]
+            chunk['position'] = positions[start:start + take]
+            self.n += take
+            start += take
+            if self.n == self.chunk_size:
+                self.flush()
+        if self._flush_due():
+            self.flush()
+
+    def _flush_due(self):
+        return self.flush_interval is not None and time.monotonic() - self.last_flush >= self.flush_interval
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if self.n:
+            self.backend.write(self.records[:self.n])
+            self.n = 0
+        self.backend.flush()
+
+    def close(self):
+        self.flush()
+        self.backend.close()
@@ -0,0 +1,240 @@
+import os
+import sys
+import time
+import fcntl
+import select
+import signal
+import termios
+import argparse
+import tempfile
+import threading
+import subprocess
+import numpy as np
+
+import serial
+from simulator import EncoderSimulator
+from analysis import read_header, load_session, CLI_FILE_PATTERN
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BLOCK_LINES = 4096  # Lines per write when replaying as fast as possible
+
+
+def estimate_freq(records):
+    # GUI recordings carry no frequency, take it from the median sample interval
+    if len(records) < 2:
+        return 20
+    return max(1, int(round(1e9 / np.median(np.diff(records['timestamp_ns'])))))
+
+
+def raw_values(records, layout):
+    # The board prints pos+count. GUI recordings kept those raw values; the other
+    # layouts were offset by the first sample, so shift them back to values that can
+    # never be 0 (the readers drop 0 as "no data").
+    positions = records['position'].astype(np.int64)
+    if layout == 'gui' or len(positions) == 0:
+        return positions
+    return positions + (1 - int(positions.min()))
+
+
+class SessionReplay(EncoderSimulator):
+    # Replays a recording through the simulator's pseudo-terminal. Waits for 'S' like the
+    # board does, then prints the recorded values with the recorded inter-sample timing
+    # divided by `speed` (0 = as fast as the port takes them). `finished` is set once
+    # every line has been written, `drained` once the reader has also read them all
+    # off the port (at drained_ns, epoch ns like sent_times).
+
+    def __init__(self, records, layout, speed=1.0):
+        super().__init__(freq=estimate_freq(records), exact=True)
+        self.values = raw_values(records, layout)
+        self.speed = speed
+        offsets = records['timestamp_ns'] - records['timestamp_ns'][0] if len(records) else np.empty(0, dtype=np.int64)
+        self.offsets_ns = (offsets / speed).astype(np.int64) if speed else None
+        self.index = 0
+        self.finished = threading.Event()
+        self.drained = threading.Event()
+        self.drained_ns = None
+        self._t0 = None
+        if len(self.values) == 0:
+            self.finished.set()
+
+    def unread_bytes(self):
+        # Bytes written to the port that the reader hasn't read yet
+        return int.from_bytes(fcntl.ioctl(self._slave_fd, termios.FIONREAD, b'\0\0\0\0'), sys.byteorder)
+
+    def next_lines(self, n):
+        values = self.values[self.index:self.index + n]
+        self.index += len(values)
+        now_ns = time.time_ns()
+        self.sent_counts.extend(range(self.index - len(values), self.index))
+        self.sent_times.extend([now_ns] * len(values))
+        return (''.join(f"{value}\r\n" for value in values.tolist())).encode('latin1')
+
+    def _due(self, now):
+        # Number of lines whose replay time has come
+        if self.offsets_ns is None:
+            return min(BLOCK_LINES, len(self.values) - self.index)
+        return int(np.searchsorted(self.offsets_ns, now - self._t0, side='right')) - self.index
+
+    def run(self):
+        while not self._stop_event.is_set():
+            timeout = 0.05
+            if self.should_pulse and not self.finished.is_set():
+                timeout = 0.0 if self.offsets_ns is None else \
+                    max(0.0, (self._t0 + int(self.offsets_ns[self.index]) - time.perf_counter_ns()) / 1e9)
+            elif self.finished.is_set() and not self.drained.is_set():
+                if self.unread_bytes() == 0:
+                    self.drained_ns = time.time_ns()
+                    self.drained.set()
+                timeout = 0.001
+            readable, _, _ = select.select([self.master_fd], [], [], timeout)
+            if readable:
+                was_pulsing = self.should_pulse
+                self.handle_commands(os.read(self.master_fd, 1024).decode('latin1'))
+                if self.should_pulse and not was_pulsing and self.offsets_ns is not None:
+                    # (Re)start so the next line keeps its recorded spacing from now on
+                    self._t0 = time.perf_counter_ns() - int(self.offsets_ns[min(self.index, len(self.values) - 1)])
+            if not self.should_pulse or self.finished.is_set():
+                continue
+
+            due = self._due(time.perf_counter_ns())
+            if due <= 0:
+                continue
+            try:
+                os.write(self.master_fd, self.next_lines(due))
+            except OSError:
+                break
+            if self.index >= len(self.values):
+                self.finished.set()
+
+
+def _newest_recording(data_dir):
+    names = sorted(f for f in os.listdir(data_dir) if CLI_FILE_PATTERN.match(f))
+    return os.path.join(data_dir, names[-1])
+
+
+def replay_cli(replay, freq, work_dir, grace_s=1.0):
+    # Run the unmodified read_encoder.py against the replay and stop it with Ctrl-C
+    # once the replay has been written out and drained
+    env = dict(os.environ, HOME=work_dir)
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, 'read_encoder.py'), replay.port_name, '--freq', str(freq)],
+                            env=env, stdout=subprocess.DEVNULL)
+    while not replay.finished.wait(0.1):
+        if proc.poll() is not None:
+            break  # The reader died, compare whatever it wrote
+    time.sleep(grace_s)
+    proc.send_signal(signal.SIGINT)
+    proc.wait()
+    return _newest_recording(os.path.join(work_dir, 'Documents', 'serial_data'))
+
+
+def replay_gui(replay, freq, work_dir, grace_s=1.0):
+    # Drive SerialApp's acquisition worker the same way toggleRecording does, without a window
+    from encoder_gui import AcquisitionWorker
+    path = os.path.join(work_dir, 'replay_gui.csv')
+    ser = serial.Serial(replay.port_name, 9600)
+    ser.write(f"A {freq}".encode())
+    time.sleep(0.1)
+    ser.write("S".encode())
+    ser.timeout = 0.1
+    worker = AcquisitionWorker(ser, path, freq)
+    worker.start()
+    replay.finished.wait()
+    time.sleep(grace_s)
+    worker.stop()
+    worker.wait()
+    ser.write("E".encode())
+    ser.close()
+    return path
+
+
+READERS = {'cli': replay_cli, 'gui': replay_gui}
+
+
+def compare(original, replayed, speed):
+    # Samples and positions must match exactly (positions relative to the first sample,
+    # since the CLI offsets them and the GUI doesn't); timing is reported, not required
+    report = {'original_samples': len(original), 'replayed_samples': len(replayed)}
+    same_length = len(original) == len(replayed)
+    report['positions_match'] = bool(same_length and len(original) and np.array_equal(
+        original['position'] - original['position'][0], replayed['position'] - replayed['position'][0]))
+    report['match'] = report['positions_match'] or (same_length and len(original) == 0)
+    if same_length and len(original) > 1 and speed:
+        error_ms = np.abs(np.diff(replayed['timestamp_ns']) - np.diff(original['timestamp_ns']) / speed) / 1e6
+        report['interval_error_ms'] = np.percentile(error_ms, [50, 99, 100]).tolist()
+    elif not report['match'] and len(original) and len(replayed):
+        n = min(len(original), len(replayed))
+        differs = (original['position'][:n] - original['position'][0]) != (replayed['position'][:n] - replayed['position'][0])
+        report['first_difference'] = int(np.argmax(differs)) if differs.any() else n
+    return report
+
+
+def replay_session(path, reader='cli', speed=1.0, work_dir=None):
+    layout, freq, _ = read_header(path)
+    original = load_session(path)
+    freq = int(freq) if freq else estimate_freq(original)
+    replay = SessionReplay(original, layout, speed)
+    replay.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        output = READERS[reader](replay, freq, work_dir or tmp)
+        elapsed = time.perf_counter() - start
+        replayed = load_session(output)
+    replay.stop()
+    replay.join()
+    replay.close()
+    # Throughput from the first write until the reader had read everything (or the last
+    # write, if it never did)
+    _, sent_times = replay.sent_log()
+    span = 0.0
+    if len(sent_times):
+        span = ((replay.drained_ns or int(sent_times[-1])) - sent_times[0]) / 1e9
+    report = compare(original, replayed, speed)
+    report.update(reader=reader, speed=speed, elapsed_s=elapsed, rate=float(len(sent_times) / span) if span else 0.0)
+    return report
+
+
+def print_report(path, report):
+    verdict = "MATCH" if report['match'] else "MISMATCH"
+    speed = f"{report['speed']:g}x" if report['speed'] else "max speed"
+    line = (f"{path} [{report['reader']}, {speed}]: {verdict}, "
+            f"{report['replayed_samples']}/{report['original_samples']} samples, sent at {report['rate']:.0f} samples/s")
+    if 'interval_error_ms' in report:
+        p50, p99, pmax = report['interval_error_ms']
+        line += f", interval error p50={p50:.3f} p99={p99:.3f} max={pmax:.3f} ms"
+    if 'first_difference' in report:
+        line += f", first difference at sample {report['first_difference']}"
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recording through a virtual serial port.")
+    parser.add_argument("recording", type=str, help="Recording to replay (either CSV layout, .session or .archive).")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed, 0 = as fast as possible.")
+    parser.add_argument("--readers", nargs='+', default=['cli'], choices=list(READERS), help="Readers to re-record with.")
+    parser.add_argument("--serve", action='store_true', default=False, help="Only serve the replay, print the port and wait.")
+    args = parser.parse_args()
+
+    if args.serve:
+        layout, _, _ = read_header(args.recording)
+        replay = SessionReplay(load_session(args.recording), layout, args.speed)
+        replay.start()
+        print(replay.port_name, flush=True)
+        try:
+            while not replay.finished.wait(0.1):
+                pass
+            print(f"Replay finished, {replay.index} samples sent.")
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        replay.stop()
+        replay.join()
+        replay.close()
+        sys.exit(0)
+
+    failed = False
+    for reader in args.readers:
+        report = replay_session(args.recording, reader, args.speed)
+        print_report(args.recording, report)
+        failed |= not report['match']
+    sys.exit(1 if failed else 0)
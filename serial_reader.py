@@ -0,0 +1,137 @@
+import threading
+import numpy as np
+
+from clock_sync import MonotonicClock
+
+
+class RingBuffer:
+    # Single-producer/single-consumer ring of (host_time_ns, position) records.
+    # The producer only ever moves write_index and the consumer only ever moves
+    # read_index, so no lock is needed between the reader thread and the consumer.
+
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.positions = np.zeros(capacity, dtype=np.int64)
+        self.write_index = 0  # Total records ever written
+        self.claim_index = 0  # Total records the producer has started writing (>= write_index)
+        self.read_index = 0  # Total records ever consumed or dropped
+        self.overruns = 0  # Records overwritten before the consumer got to them
+
+    def push(self, host_time_ns, position):
+        # Producer side: write one record
+        i = self.write_index % self.capacity
+        self.claim_index = self.write_index + 1
+        self.times[i] = host_time_ns
+        self.positions[i] = position
+        self.write_index += 1
+
+    def push_many(self, host_time_ns, positions):
+        # Producer side: write a batch of records sharing one arrival time
+        n = len(positions)
+        if n == 0:
+            return
+        if n > self.capacity:
+            positions = positions[-self.capacity:]
+            self.write_index += n - self.capacity
+            n = self.capacity
+        # Announce the slots before touching them, so a consumer copying concurrently
+        # can tell which of its records may be half overwritten
+        self.claim_index = self.write_index + n
+        start = self.write_index % self.capacity
+        first = min(n, self.capacity - start)
+        self.times[start:start + first] = host_time_ns
+        self.positions[start:start + first] = positions[:first]
+        if first < n:
+            self.times[:n - first] = host_time_ns
+            self.positions[:n - first] = positions[first:]
+        self.write_index += n
+
+    def __len__(self):
+        return min(self.write_index - self.read_index, self.capacity)
+
+    def pop_all(self):
+        # Consumer side: copy out everything written since the last call
+        end = self.write_index
+        start = self.read_index
+        if end - start > self.capacity:
+            # The producer lapped us, the oldest records are gone
+            self.overruns += end - start - self.capacity
+            start = end - self.capacity
+        idx = np.arange(start, end) % self.capacity
+        times = self.times[idx]
+        positions = self.positions[idx]
+
+        # The producer may have kept writing while we copied, drop anything it overwrote
+        # or was still overwriting (claimed but not yet published)
+        lapped = self.claim_index - self.capacity - start
+        if lapped > 0:
+            lapped = min(lapped, end - start)
+            self.overruns += lapped
+            times = times[lapped:]
+            positions = positions[lapped:]
+        self.read_index = end
+        return times, positions
+
+
+class SerialReaderThread(threading.Thread):
+    # Drains the serial port in bulk and pushes parsed samples into a RingBuffer.
+    # If data_event is given it is set after every push, so consumers can wait on it
+    # instead of polling.
+
+    def __init__(self, ser, buffer, clock=None, data_event=None):
+        super().__init__(daemon=True)
+        self.ser = ser
+        self.buffer = buffer
+        self.clock = clock or MonotonicClock()
+        self.data_event = data_event
+        self.parse_errors = 0
+        self.in_waiting_high_water = 0  # Largest backlog seen in the OS serial buffer
+        self.bytes_read = 0
+        self.error = None
+        self._stop_event = threading.Event()
+        self._partial = b''
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                waiting = self.ser.in_waiting
+                if not waiting:
+                    # Block for at most one byte so we still notice stop() quickly
+                    chunk = self.ser.read(1)
+                    if not chunk:
+                        continue
+                    waiting = self.ser.in_waiting
+                    if waiting:
+                        self.in_waiting_high_water = max(self.in_waiting_high_water, waiting)
+                        chunk += self.ser.read(waiting)
+                else:
+                    self.in_waiting_high_water = max(self.in_waiting_high_water, waiting)
+                    chunk = self.ser.read(waiting)
+                self.bytes_read += len(chunk)
+                self.handle_chunk(chunk, self.clock.now_ns())
+        except Exception as e:
+            # Surface the error to the consumer instead of dying silently
+            self.error = e
+
+    def handle_chunk(self, chunk, host_time_ns):
+        data = self._partial + chunk
+        lines = data.split(b'\n')
+        self._partial = lines.pop()  # Keep the incomplete tail for the next read
+
+        positions = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                positions.append(int(line))
+            except ValueError:
+                self.parse_errors += 1
+        if positions:
+            self.buffer.push_many(host_time_ns, np.asarray(positions, dtype=np.int64))
+            if self.data_event is not None:
+                self.data_event.set()
@@ -0,0 +1,125 @@
+import os
+import numpy as np
+
+# Binary session layout:
+#   fixed 128-byte header (HEADER_DTYPE, zero padded)
+#   followed by packed little-endian RECORD_DTYPE records, appended as they arrive.
+# A crash can only leave a partial record at the very end, which the reader ignores.
+MAGIC = b'ENCSESS1'
+VERSION = 1
+HEADER_SIZE = 128
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u4'),
+    ('header_size', '<u4'),
+    ('freq', '<f8'),
+    ('start_time_ns', '<i8'),
+    ('port', 'S64'),
+])
+
+# One record per sample: cycle counter, host arrival time, period since the previous sample and position
+RECORD_DTYPE = np.dtype([
+    ('counter', '<i8'),
+    ('timestamp_ns', '<i8'),
+    ('period_ms', '<f8'),
+    ('position', '<i8'),
+])
+
+
+class SessionWriter:
+    # Recorder backend appending records to a binary session file
+
+    def __init__(self, path, metadata=None):
+        metadata = metadata or {}
+        self.path = path
+        self.file = open(path, mode='wb')
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header['magic'] = MAGIC
+        header['version'] = VERSION
+        header['header_size'] = HEADER_SIZE
+        header['freq'] = metadata.get('freq') or 0
+        header['start_time_ns'] = metadata.get('start_time_ns') or 0
+        header['port'] = str(metadata.get('port') or '').encode('utf-8')[:64]
+        self.file.write(header.tobytes().ljust(HEADER_SIZE, b'\0'))
+        self.file.flush()
+
+    def write(self, records):
+        self.file.write(np.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes())
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class SessionReader:
+    # Memory-maps a session file. Columns are zero-copy views into the mapping.
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read(HEADER_DTYPE.itemsize)
+        if len(data) < HEADER_DTYPE.itemsize:
+            raise ValueError(f"{path} is not an encoder session file.")
+        header = np.frombuffer(data, dtype=HEADER_DTYPE)
+        if header['magic'][0] != MAGIC:
+            raise ValueError(f"{path} is not an encoder session file.")
+        if header['version'][0] != VERSION:
+            raise ValueError(f"Unsupported session file version: {header['version'][0]}")
+        self.header_size = int(header['header_size'][0])
+        if not HEADER_DTYPE.itemsize <= self.header_size <= os.path.getsize(path):
+            raise ValueError(f"{path} has a damaged header (header size {self.header_size}).")
+        self.freq = float(header['freq'][0])
+        self.start_time_ns = int(header['start_time_ns'][0])
+        self.port = header['port'][0].decode('utf-8')
+
+        # Only map whole records, a truncated tail after a crash is dropped
+        data_bytes = os.path.getsize(path) - self.header_size
+        self.truncated_bytes = data_bytes % RECORD_DTYPE.itemsize
+        n = data_bytes // RECORD_DTYPE.itemsize
+        if n > 0:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=self.header_size, shape=(n,))
+        else:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        # The mapping is released once no views into it remain
+        self.records = np.empty(0, dtype=RECORD_DTYPE)
+
+    @property
+    def counter(self):
+        return self.records['counter']
+
+    @property
+    def timestamp_ns(self):
+        return self.records['timestamp_ns']
+
+    @property
+    def period_ms(self):
+        return self.records['period_ms']
+
+    @property
+    def position(self):
+        return self.records['position']
+
+    def between(self, start_ns, stop_ns):
+        # Records with start_ns <= timestamp_ns < stop_ns, as a view (timestamps are monotonic)
+        ts = self.timestamp_ns
+        i = np.searchsorted(ts, start_ns, side='left')
+        j = np.searchsorted(ts, stop_ns, side='left')
+        return self.records[i:j]
+
+    def between_seconds(self, start_s, stop_s):
+        # Same as between() with times in seconds since the recording started
+        return self.between(self.start_time_ns + int(start_s * 1e9), self.start_time_ns + int(stop_s * 1e9))
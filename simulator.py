@@ -0,0 +1,159 @@
+import os
+import re
+import sys
+import tty
+import time
+import select
+import signal
+import random
+import argparse
+import threading
+import numpy as np
+
+
+class EncoderSimulator(threading.Thread):
+    # Emulates encoder_sync.ino behind a pseudo-terminal.
+    # Understands the same commands ('A <freq>', 'S', 'E') and prints pos+count lines
+    # at the configured rate. Optional jitter, bursts and garbage lines stress the readers.
+
+    def __init__(self, freq=50, exact=False, velocity=0.0, jitter_ms=0.0, burst_prob=0.0, burst_size=10,
+                 garbage_prob=0.0, seed=None):
+        super().__init__(daemon=True)
+        self.master_fd, slave_fd = os.openpty()
+        tty.setraw(slave_fd)
+        self.port_name = os.ttyname(slave_fd)
+        self._slave_fd = slave_fd  # Keep the slave open so writes never fail with EIO
+
+        self.freq = freq
+        self.exact = exact  # False mimics the sketch's integer millisecond interval
+        self.velocity = velocity  # Encoder counts per sample
+        self.jitter_ms = jitter_ms
+        self.burst_prob = burst_prob
+        self.burst_size = burst_size
+        self.garbage_prob = garbage_prob
+        self.random = random.Random(seed)
+
+        self.count = 101  # Same starting value as the sketch
+        self.encoder_pos = 0.0
+        self.should_pulse = False
+        self.sent_counts = []  # (count, send_time_ns) for every emitted sample
+        self.sent_times = []
+        self._commands = ''
+        self._held = 0
+        self._hold_until_ns = None
+        self._stop_event = threading.Event()
+
+    @property
+    def interval_ns(self):
+        if self.exact:
+            return int(1e9 / self.freq)
+        # The sketch uses unsigned long interval = 1000 / freq (ms)
+        return (1000 // self.freq) * 1_000_000
+
+    def stop(self):
+        self._stop_event.set()
+
+    def close(self):
+        os.close(self.master_fd)
+        os.close(self._slave_fd)
+
+    def handle_commands(self, text):
+        self._commands += text
+        while self._commands:
+            c = self._commands[0]
+            if c == 'S':
+                self.should_pulse = True
+                self._next_ns = time.perf_counter_ns()
+            elif c == 'E':
+                self.should_pulse = False
+            elif c == 'A':
+                # Serial.parseInt(): skip non-digits, read digits
+                m = re.match(r'A\D*(\d+)', self._commands)
+                if m is None or m.end() == len(self._commands) and not text.endswith('\n'):
+                    break  # Wait for the rest of the number
+                self.freq = int(m.group(1))
+                self._commands = self._commands[m.end():]
+                continue
+            self._commands = self._commands[1:]
+
+    def next_lines(self, n):
+        # Build the output for the next n samples
+        lines = []
+        now_ns = time.time_ns()
+        for _ in range(n):
+            self.count += 1
+            self.encoder_pos += self.velocity
+            lines.append(f"{int(self.encoder_pos) + self.count}\r\n")
+            self.sent_counts.append(self.count)
+            self.sent_times.append(now_ns)
+            if self.garbage_prob and self.random.random() < self.garbage_prob:
+                lines.append(self.random.choice(["\r\n", "?x\r\n", "12a3\r\n", "\xff\r\n"]))
+        return ''.join(lines).encode('latin1')
+
+    def run(self):
+        self._next_ns = time.perf_counter_ns()
+        while not self._stop_event.is_set():
+            timeout = 0.05
+            if self.should_pulse:
+                timeout = max(0.0, (self._next_ns - time.perf_counter_ns()) / 1e9)
+            readable, _, _ = select.select([self.master_fd], [], [], timeout)
+            if readable:
+                self.handle_commands(os.read(self.master_fd, 1024).decode('latin1'))
+            if not self.should_pulse:
+                continue
+
+            # Emit every sample that is due, jittered sends go out a little late
+            now = time.perf_counter_ns()
+            due = 0
+            while self._next_ns <= now:
+                due += 1
+                self._next_ns += max(self.interval_ns, 1)
+            if not due:
+                continue
+            if self._hold_until_ns is None and self.burst_prob and self.random.random() < self.burst_prob:
+                self._hold_until_ns = now + self.burst_size * self.interval_ns
+            if self._hold_until_ns is not None:
+                # Hold samples back and release them together
+                self._held += due
+                if now < self._hold_until_ns:
+                    continue
+                due, self._held, self._hold_until_ns = self._held, 0, None
+            if self.jitter_ms:
+                time.sleep(abs(self.random.gauss(0, self.jitter_ms)) / 1000)
+            try:
+                os.write(self.master_fd, self.next_lines(due))
+            except OSError:
+                break
+
+    def sent_log(self):
+        return np.array(self.sent_counts, dtype=np.int64), np.array(self.sent_times, dtype=np.int64)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Encoder board simulator on a pseudo-terminal.")
+    parser.add_argument("--freq", type=int, default=50, help="Initial frequency in Hz.")
+    parser.add_argument("--exact", action='store_true', default=False, help="Use the exact 1/freq interval instead of the sketch's integer ms.")
+    parser.add_argument("--velocity", type=float, default=0.0, help="Encoder counts per sample.")
+    parser.add_argument("--jitter_ms", type=float, default=0.0, help="Send jitter standard deviation in ms.")
+    parser.add_argument("--burst_prob", type=float, default=0.0, help="Probability of holding samples back into a burst.")
+    parser.add_argument("--burst_size", type=int, default=10, help="Samples per burst.")
+    parser.add_argument("--garbage_prob", type=float, default=0.0, help="Probability of a garbage line after a sample.")
+    parser.add_argument("--log", type=str, default=None, help="Save (count, send_time_ns) of every sample to this .npz on exit.")
+    args = parser.parse_args()
+
+    sim = EncoderSimulator(args.freq, args.exact, args.velocity, args.jitter_ms, args.burst_prob,
+                           args.burst_size, args.garbage_prob)
+    signal.signal(signal.SIGTERM, lambda *_: sim.stop())
+    sim.start()
+    print(sim.port_name, flush=True)
+    try:
+        while sim.is_alive():
+            sim.join(0.1)
+    except KeyboardInterrupt:
+        sim.stop()
+        sim.join()
+    if args.log:
+        counts, times = sim.sent_log()
+        np.savez(args.log, count=counts, send_time_ns=times)
+    sim.close()
+    sys.exit(0)
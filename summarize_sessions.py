@@ -0,0 +1,145 @@
+import os
+import csv
+import json
+import hashlib
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+from analysis import summarize, GUI_FILE_PATTERN, CLI_FILE_PATTERN
+
+SUMMARY_VERSION = 3  # Bump when summarize() changes so cached results are recomputed
+TABLE_COLUMNS = ['Subject', 'Date', 'Run', 'File', 'Start', 'Samples', 'Duration_s', 'Rate_Hz',
+                 'Distance', 'Mean_speed', 'Peak_speed', 'Jitter_ms', 'Gaps']
+
+
+def find_runs(paths):
+    # Subject_Date_Run.csv files written by SerialApp, as (subject, date, run, path), and
+    # the other CSV files found in the directories that aren't read_encoder.py recordings
+    # or tables written beside a recording, so misnamed runs don't go missing silently
+    runs = []
+    unmatched = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, filenames in os.walk(path):
+                for f in sorted(filenames):
+                    m = GUI_FILE_PATTERN.match(f)
+                    if m:
+                        runs.append((m['subject'], m['date'], m['run'], os.path.join(dirpath, f)))
+                    elif f.endswith('.csv') and not f.endswith(('_frames.csv', '_bouts.csv')) and not CLI_FILE_PATTERN.match(f):
+                        unmatched.append(os.path.join(dirpath, f))
+        else:
+            m = GUI_FILE_PATTERN.match(os.path.basename(path))
+            if m is None:
+                raise ValueError(f"{path} is not named Subject_Date_Run.csv")
+            runs.append((m['subject'], m['date'], m['run'], path))
+    return sorted(runs), unmatched
+
+
+def timing_path(path):
+    # The *_summary.json the readers write next to each recording
+    return os.path.splitext(path)[0] + '_summary.json'
+
+
+def file_hash(path):
+    # Content hash of the recording and its timing summary, so renamed or touched files
+    # are still cache hits and a summary written later is picked up
+    digest = hashlib.blake2b(digest_size=20)
+    for part in (path, timing_path(path)):
+        if not os.path.exists(part):
+            continue
+        with open(part, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def load_cache(cache_path):
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, 'r') as file:
+            cache = json.load(file)
+        if cache.get('version') == SUMMARY_VERSION:
+            return cache
+    return {'version': SUMMARY_VERSION, 'summaries': {}}
+
+
+def save_cache(cache, cache_path):
+    # Write to a temporary file first so an interrupted run never corrupts the cache
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(cache, file)
+    os.replace(tmp_path, cache_path)
+
+
+def _summarize(path):
+    try:
+        summary = summarize(path)
+        # The recorded times are de-jittered trigger times, the arrival jitter is only
+        # in the timing summary written during acquisition
+        if os.path.exists(timing_path(path)):
+            with open(timing_path(path), 'r') as file:
+                timing = json.load(file).get('timing')
+            if timing is not None:
+                summary['jitter_ms'] = timing['jitter_std_ms']
+    except Exception as e:
+        return {'error': str(e)}
+    summary['start'] = summary['start'].isoformat(sep=' ') if summary['start'] else None
+    return summary
+
+
+def summarize_runs(runs, cache_path=None, workers=None):
+    # Summaries for every run, computed in a process pool. Only files whose content
+    # hash is not in the cache are summarized again.
+    cache = load_cache(cache_path)
+    summaries = cache['summaries']
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        paths = [path for _, _, _, path in runs]
+        hashes = list(pool.map(file_hash, paths))
+        # One path per uncached content hash, identical copies are summarized once
+        todo = {}
+        for digest, path in zip(hashes, paths):
+            if digest not in summaries:
+                todo.setdefault(digest, path)
+        for (digest, path), summary in zip(todo.items(), pool.map(_summarize, list(todo.values()))):
+            if 'error' not in summary:
+                summaries[digest] = summary
+            else:
+                print(f"{path}: ERROR {summary['error']}")
+    if cache_path:
+        save_cache(cache, cache_path)
+    return [(run, summaries.get(digest)) for run, digest in zip(runs, hashes)], len(todo)
+
+
+def write_table(results, path, counts_per_unit=1.0):
+    # One row per run; distance and speeds in counts_per_unit units
+    with open(path, mode='w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(TABLE_COLUMNS)
+        for (subject, date, run, file_path), summary in results:
+            if summary is None:
+                continue
+            writer.writerow([subject, date, run, file_path, summary['start'], summary['samples'],
+                             round(summary['duration_s'], 3), round(summary['rate_hz'], 3),
+                             round(summary['distance'] / counts_per_unit, 3),
+                             round(summary['mean_speed'] / counts_per_unit, 3),
+                             round(summary['peak_speed'] / counts_per_unit, 3),
+                             round(summary['jitter_ms'], 4), summary['gaps']])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize every Subject_Date_Run.csv recording into one table.")
+    parser.add_argument("paths", type=str, nargs='+', help="Recordings or directories to scan.")
+    parser.add_argument("--output", type=str, default="session_summary.csv", help="Consolidated table to write.")
+    parser.add_argument("--cache", type=str, default="session_summary_cache.json", help="Cache file, pass an empty string to disable.")
+    parser.add_argument("--counts_per_unit", type=float, default=1.0, help="Encoder counts per distance unit.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    args = parser.parse_args()
+
+    start = datetime.now()
+    runs, unmatched = find_runs(args.paths)
+    for path in unmatched:
+        print(f"{path}: skipped, not named Subject_Date_Run.csv")
+    results, computed = summarize_runs(runs, args.cache or None, args.workers)
+    write_table(results, args.output, args.counts_per_unit)
+    print(f"{len(runs)} runs ({computed} summarized, {len(runs) - computed} from cache) "
+          f"-> {args.output} in {(datetime.now() - start).total_seconds():.1f} s")
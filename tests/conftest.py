@@ -0,0 +1,68 @@
+import os
+import sys
+
+# The modules live at the repository root, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import threading
+import pytest
+
+
+class FakeSerial:
+    # Stands in for serial.Serial: serves the given bytes, then times out on reads
+    # like a quiet port. With fail_when_drained, in_waiting raises OSError once every
+    # byte was read, like an unplugged board.
+
+    def __init__(self, data=b'', timeout=0.01, fail_when_drained=False):
+        self.data = bytearray(data)
+        self.timeout = timeout
+        self.fail_when_drained = fail_when_drained
+        self.written = bytearray()
+        self.is_open = True
+        self.lock = threading.Lock()
+
+    def feed(self, data):
+        with self.lock:
+            self.data += data
+
+    @property
+    def in_waiting(self):
+        with self.lock:
+            if not self.data and self.fail_when_drained:
+                raise OSError("device disconnected")
+            return len(self.data)
+
+    def read(self, size=1):
+        with self.lock:
+            chunk = bytes(self.data[:size])
+            del self.data[:size]
+        if not chunk:
+            time.sleep(self.timeout)
+        return chunk
+
+    def write(self, data):
+        self.written += data
+        return len(data)
+
+    def close(self):
+        self.is_open = False
+
+
+@pytest.fixture
+def fake_serial():
+    return FakeSerial
+
+
+@pytest.fixture
+def berlin_time():
+    # Local time in a zone with daylight saving, restored afterwards
+    old = os.environ.get('TZ')
+    os.environ['TZ'] = 'Europe/Berlin'
+    time.tzset()
+    yield
+    if old is None:
+        del os.environ['TZ']
+    else:
+        os.environ['TZ'] = old
+    time.tzset()
@@ -0,0 +1,80 @@
+import numpy as np
+
+from session_file import RECORD_DTYPE
+from align_frames import align
+
+
+def make_records(counters, interval_ns=10_000_000):
+    counters = np.asarray(counters, dtype=np.int64)
+    records = np.zeros(len(counters), dtype=RECORD_DTYPE)
+    records['counter'] = counters
+    records['timestamp_ns'] = 1_000_000_000_000 + (counters - 1) * interval_ns
+    records['position'] = (counters - 1) * 2
+    return records
+
+
+def test_no_drops():
+    table, report = align(make_records(np.arange(1, 11)), 10)
+    assert report['dropped_samples'] == 0
+    assert report['missing_frames'] == 0 and report['extra_frames'] == 0
+    assert not table['interpolated'].any()
+
+
+def test_counter_gap_is_interpolated():
+    counters = np.delete(np.arange(1, 11), [4, 5])
+    table, report = align(make_records(counters), 10)
+    assert report['triggers'] == 10
+    assert report['dropped_samples'] == 2 and report['drops_from'] == 'counter'
+    assert report['extra_frames'] == 0
+    assert table['interpolated'].tolist() == [False] * 4 + [True, True] + [False] * 4
+    assert table['position'][4:6].tolist() == [8.0, 10.0]
+    assert table['timestamp_ns'][5] == 1_000_000_000_000 + 5 * 10_000_000
+
+
+def test_batched_timestamps_are_not_drops():
+    # Raw arrival times: lines read in one go share a time, which must not matter
+    records = make_records(np.arange(1, 9))
+    records['timestamp_ns'] = records['timestamp_ns'] // 40_000_000 * 40_000_000
+    _, report = align(records, 8)
+    assert report['dropped_samples'] == 0 and report['extra_frames'] == 0
+
+
+def test_more_frames_than_triggers():
+    _, report = align(make_records(np.arange(1, 6)), 7)
+    assert report['extra_frames'] == 2 and report['missing_frames'] == 0
+
+
+def test_empty_recording():
+    table, report = align(np.empty(0, dtype=RECORD_DTYPE), 3)
+    assert report['samples'] == 0 and report['triggers'] == 0 and report['dropped_samples'] == 0
+    assert report['extra_frames'] == 3
+    assert len(table) == 3 and table['interpolated'].all()
+    table, report = align(np.empty(0, dtype=RECORD_DTYPE), None)
+    assert len(table) == 0 and report['frames'] == 0
+
+
+def legacy_records(triggers, interval_ns=10_000_000, seed=0):
+    # Older readers counted received lines and stamped raw arrival times
+    rng = np.random.default_rng(seed)
+    records = np.zeros(len(triggers), dtype=RECORD_DTYPE)
+    records['counter'] = np.arange(1, len(triggers) + 1)
+    records['timestamp_ns'] = 1_000_000_000_000 + triggers * interval_ns + rng.exponential(300_000, len(triggers)).astype(np.int64)
+    records['position'] = triggers * 2
+    return records
+
+
+def test_legacy_drops_are_found_from_the_timestamps():
+    # The board runs 100 ppm slow; one line is lost on the way
+    triggers = np.delete(np.arange(3000), 2000)
+    table, report = align(legacy_records(triggers, interval_ns=10_001_000), 3000, freq=100)
+    assert report['drops_from'] == 'timestamps'
+    assert report['dropped_samples'] == 1 and report['extra_frames'] == 0
+    assert np.flatnonzero(table['interpolated']).tolist() == [2000]
+    assert table['position'][2000] == 4000
+
+
+def test_legacy_batched_reads_are_not_drops():
+    records = legacy_records(np.arange(3000))
+    records['timestamp_ns'] = (records['timestamp_ns'] // 40_000_000 + 1) * 40_000_000
+    _, report = align(records, 3000)
+    assert report['dropped_samples'] == 0 and report['extra_frames'] == 0
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from analysis import local_to_epoch_ns, load_session, iter_kinematics, iter_resampled, summarize
+
+
+def write_gui_csv(path, positions, interval_s=0.01):
+    # SerialApp layout: raw pos + count values, one row per trigger
+    start = np.datetime64('2026-01-15T12:00:00', 'us')
+    with open(path, 'w') as f:
+        f.write("Frame,Timestamp,Timestep,Position\n")
+        for i, position in enumerate(positions):
+            stamp = str(start + np.timedelta64(int(i * interval_s * 1e6), 'us')).replace('T', ' ')
+            f.write(f"{i + 1},{stamp},{interval_s if i else 0},{position}\n")
+
+
+def test_stationary_wheel_has_no_distance(tmp_path):
+    path = str(tmp_path / 'mouse_0115_1.csv')
+    write_gui_csv(path, [101, 102, 103])
+    summary = summarize(path)
+    assert summary['samples'] == 3
+    assert summary['distance'] == 0
+    assert summary['peak_speed'] == 0 and summary['mean_speed'] == 0
+
+
+def test_kinematics_across_chunks(tmp_path):
+    # The wheel moves 5 counts per trigger for the first 10 samples, then stops
+    moves = np.concatenate(([0], np.full(9, 5), np.zeros(10, dtype=int)))
+    path = str(tmp_path / 'mouse_0115_2.csv')
+    write_gui_csv(path, (1000 + np.cumsum(moves) + np.arange(1, 21)).tolist())
+    whole = list(iter_kinematics(path))
+    chunked = list(iter_kinematics(path, chunk_size=3))
+    assert whole[0]['distance'][-1] == 45
+    np.testing.assert_allclose(np.concatenate([c['velocity'] for c in chunked]), whole[0]['velocity'])
+    assert whole[0]['velocity'][1] == pytest.approx(500)
+    assert len(load_session(path)) == 20
+
+
+def test_resampled_positions_match_kinematics(tmp_path):
+    moves = np.concatenate(([0], np.full(9, 5), np.zeros(10, dtype=int)))
+    path = str(tmp_path / 'mouse_0115_3.csv')
+    write_gui_csv(path, (1000 + np.cumsum(moves) + np.arange(1, 21)).tolist())
+    kinematics = np.concatenate([c['position'] for c in iter_kinematics(path)])
+    resampled = np.concatenate([positions for _, positions in iter_resampled(path, freq=100, chunk_size=3)])
+    np.testing.assert_allclose(resampled, kinematics)
+    assert resampled[-1] == 1046
+
+
+def test_local_to_epoch_across_dst_change(berlin_time):
+    # 01:59:59.5 CET and 03:00:00.5 CEST are one second apart
+    local = np.array(['2026-03-29T01:59:59.5', '2026-03-29T03:00:00.5'], dtype='datetime64[ns]').astype(np.int64)
+    epoch = local_to_epoch_ns(local)
+    assert epoch[1] - epoch[0] == 1_000_000_000
+    assert epoch[1] == np.datetime64('2026-03-29T01:00:00.5', 'ns').astype(np.int64)
+
+
+def test_empty_recording(tmp_path):
+    path = str(tmp_path / 'mouse_0115_3.csv')
+    write_gui_csv(path, [])
+    assert len(load_session(path)) == 0
+    assert list(iter_kinematics(path)) == []
+    summary = summarize(path)
+    assert summary['samples'] == 0 and summary['start'] is None and summary['distance'] == 0
@@ -0,0 +1,98 @@
+import os
+import numpy as np
+import pytest
+
+from session_file import RECORD_DTYPE
+from archive_file import zigzag, unzigzag, encode_varints, decode_varints, ArchiveWriter, ArchiveReader
+from recorder import RotatingBackend, BackgroundWriter
+
+
+def make_records(n, start=1, interval_ns=10_000_000, period_ms=10.0):
+    records = np.zeros(n, dtype=RECORD_DTYPE)
+    records['counter'] = np.arange(start, start + n)
+    records['timestamp_ns'] = 1_000_000_000_000 + (records['counter'] - 1) * interval_ns
+    records['period_ms'] = period_ms
+    records['position'] = (np.sin(records['counter'] / 50) * 1000).astype(np.int64)
+    return records
+
+
+def test_zigzag_round_trip():
+    values = np.array([0, 1, -1, 2, -2, 2**62, -2**62, 2**63 - 1, -2**63], dtype=np.int64)
+    encoded = zigzag(values)
+    assert encoded[:5].tolist() == [0, 2, 1, 4, 3]
+    assert np.array_equal(unzigzag(encoded), values)
+
+
+def test_varint_round_trip():
+    values = np.array([0, 1, 127, 128, 300, 2**35, 2**64 - 1], dtype=np.uint64)
+    data = encode_varints(values)
+    assert data[:4] == bytes([0, 1, 127, 0x80])
+    assert len(encode_varints(np.array([2**64 - 1], dtype=np.uint64))) == 10
+    assert np.array_equal(decode_varints(data), values)
+    assert len(decode_varints(encode_varints(np.empty(0, dtype=np.uint64)))) == 0
+
+
+def test_round_trip_and_time_range(tmp_path):
+    path = str(tmp_path / 'run.archive')
+    records = make_records(10000)
+    records['period_ms'][::7] = 1 / 3  # Not a short decimal, stored as float bits
+    writer = ArchiveWriter(path, {'freq': 100}, chunk_records=1000)
+    for start in range(0, len(records), 333):
+        writer.write(records[start:start + 333])
+    writer.close()
+    with ArchiveReader(path) as archive:
+        assert archive.freq == 100
+        assert archive.chunk_count == 10
+        assert archive.read_all().tobytes() == records.tobytes()
+        t = records['timestamp_ns']
+        assert archive.between(t[2500], t[2600]).tobytes() == records[2500:2600].tobytes()
+
+
+def test_flush_writes_only_full_chunks(tmp_path):
+    path = str(tmp_path / 'slow.archive')
+    writer = ArchiveWriter(path, chunk_records=100)
+    for start in range(1, 251, 10):
+        writer.write(make_records(10, start=start))
+        writer.flush()
+    assert len(writer.index) == 2
+    writer.close()
+    with ArchiveReader(path) as archive:
+        assert archive.index['count'].tolist() == [100, 100, 50]
+
+
+def test_unclosed_archive_keeps_full_chunks(tmp_path):
+    path = str(tmp_path / 'crash.archive')
+    writer = ArchiveWriter(path, chunk_records=100)
+    writer.write(make_records(250))
+    writer.flush()
+    with ArchiveReader(path) as archive:
+        assert len(archive) == 200
+    writer.close()
+
+
+def test_rotation_writes_complete_segments(tmp_path):
+    path = str(tmp_path / 'run.archive')
+    backend = BackgroundWriter(RotatingBackend(path, {'freq': 100}, segment_records=300), sync_interval=0.01)
+    records = make_records(1000)
+    for start in range(0, len(records), 70):
+        backend.write(records[start:start + 70])
+    backend.close()
+    paths = [str(tmp_path / f'run_{i:04d}.archive') for i in range(1, 5)]
+    assert all(os.path.exists(p) for p in paths)
+    parts = []
+    for i, p in enumerate(paths):
+        with ArchiveReader(p) as archive:
+            assert archive.metadata['segment'] == i + 1
+            parts.append(archive.read_all())
+    assert [len(part) for part in parts] == [300, 300, 300, 100]
+    assert np.concatenate(parts).tobytes() == records.tobytes()
+
+
+def test_segment_by_time(tmp_path):
+    path = str(tmp_path / 'run.csv')
+    backend = RotatingBackend(path, {'freq': 100}, segment_s=2)
+    backend.write(make_records(500))
+    backend.close()
+    assert [os.path.basename(p) for p in backend.paths] == ['run_0001.csv', 'run_0002.csv', 'run_0003.csv']
+    with pytest.raises(ValueError):
+        RotatingBackend(path)
@@ -0,0 +1,54 @@
+import numpy as np
+
+from bout_detector import BoutDetector, ONSET, OFFSET
+
+
+def board_values(moves):
+    # What the board prints: pos + count, one line per trigger
+    counters = np.arange(1, len(moves) + 1)
+    return counters, np.cumsum(moves) + counters
+
+
+def feed(detector, counters, positions, freq, chunk):
+    times = 1_000_000_000_000 + (counters - 1) * (1_000_000_000 // freq)
+    events = [detector.update(counters[i:i + chunk], times[i:i + chunk], positions[i:i + chunk])
+              for i in range(0, len(counters), chunk)]
+    return np.concatenate(events)
+
+
+def test_stationary_wheel_never_runs():
+    counters, positions = board_values(np.zeros(5000, dtype=np.int64))
+    detector = BoutDetector(1000, onset_speed=500)
+    assert len(feed(detector, counters, positions, 1000, 100)) == 0
+    assert detector.velocity == 0 and not detector.running
+
+
+def test_hysteresis():
+    # 100 Hz: 8 counts/trigger = 800 counts/s, 3 = 300 counts/s (between the thresholds), then 0
+    moves = np.concatenate((np.zeros(100), np.full(200, 8), np.full(200, 3), np.zeros(200))).astype(np.int64)
+    counters, positions = board_values(moves)
+    detector = BoutDetector(100, onset_speed=500, offset_speed=200, window_s=0.1)
+    events = feed(detector, counters, positions, 100, 7)
+    assert events['kind'].tolist() == [ONSET, OFFSET]
+    onset, offset = events['counter'].tolist()
+    assert 100 < onset < 110
+    assert 500 < offset < 520  # Not when the speed falls to 300, only once it drops below 200
+    assert detector.bouts == 1
+
+
+def test_chunking_does_not_change_events():
+    rng = np.random.default_rng(0)
+    moves = np.repeat(rng.integers(0, 10, 40), 25)
+    counters, positions = board_values(moves)
+    whole = feed(BoutDetector(100, 400, window_s=0.2), counters, positions, 100, len(counters))
+    pieces = feed(BoutDetector(100, 400, window_s=0.2), counters, positions, 100, 3)
+    assert len(whole) > 0
+    assert whole.tobytes() == pieces.tobytes()
+
+
+def test_dropped_lines_are_not_movement():
+    counters, positions = board_values(np.zeros(1000, dtype=np.int64))
+    keep = np.ones(1000, dtype=bool)
+    keep[500:510] = False  # The counter jumps with the board's count
+    detector = BoutDetector(100, onset_speed=50)
+    assert len(feed(detector, counters[keep], positions[keep], 100, 10)) == 0
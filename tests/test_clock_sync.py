@@ -0,0 +1,127 @@
+import numpy as np
+
+from clock_sync import TriggerClock
+
+START_NS = 1_000_000_000_000
+
+
+def arrivals(triggers, interval_ns, latency_ns=300_000, seed=0):
+    rng = np.random.default_rng(seed)
+    trigger_ns = START_NS + triggers * interval_ns
+    return trigger_ns, trigger_ns + rng.exponential(latency_ns, len(triggers)).astype(np.int64)
+
+
+def feed(clock, times, chunk):
+    dejittered, indices = [], []
+    for start in range(0, len(times), chunk):
+        t, k = clock.update_many(times[start:start + chunk])
+        dejittered += t
+        indices += k
+    return np.array(dejittered), np.array(indices)
+
+
+def test_fit_without_drops():
+    triggers = np.arange(5000)
+    trigger_ns, arrival_ns = arrivals(triggers, 10_000_000)
+    clock = TriggerClock(100)
+    dejittered, indices = feed(clock, arrival_ns, 7)
+    assert np.array_equal(indices, triggers)
+    assert np.abs(dejittered[100:] - trigger_ns[100:]).max() < 200_000
+    stats = clock.stats()
+    assert stats['skipped'] == 0
+    assert abs(stats['drift_ppm']) < 1
+
+
+def test_dropped_line_skips_the_index():
+    triggers = np.delete(np.arange(10000), 5000)
+    trigger_ns, arrival_ns = arrivals(triggers, 10_000_000)
+    clock = TriggerClock(100)
+    dejittered, indices = feed(clock, arrival_ns, 5)
+    assert np.array_equal(indices, triggers)
+    assert np.abs(dejittered[100:] - trigger_ns[100:]).max() < 200_000
+    stats = clock.stats()
+    assert stats['skipped'] == 1
+    assert abs(stats['drift_ppm']) < 1
+    assert stats['jitter_std_ms'] < 0.5
+
+
+def test_dropped_line_one_sample_at_a_time():
+    # Without a look-ahead the first late sample keeps its index, the next one confirms the gap
+    triggers = np.delete(np.arange(10000), 5000)
+    trigger_ns, arrival_ns = arrivals(triggers, 10_000_000)
+    clock = TriggerClock(100)
+    dejittered, indices = feed(clock, arrival_ns, 1)
+    wrong = np.flatnonzero(indices != triggers)
+    assert wrong.tolist() == [5000]
+    assert clock.stats()['skipped'] == 1
+    assert np.abs(np.delete(dejittered - trigger_ns, 5000)[100:]).max() < 200_000
+
+
+def test_one_slow_transfer_is_not_a_gap():
+    triggers = np.arange(3000)
+    trigger_ns, arrival_ns = arrivals(triggers, 10_000_000, latency_ns=100_000)
+    arrival_ns[2000] += 8_000_000
+    clock = TriggerClock(100)
+    _, indices = feed(clock, arrival_ns, 1)
+    assert np.array_equal(indices, triggers)
+    assert clock.stats()['skipped'] == 0
+
+
+def test_batched_arrivals_are_spread_back():
+    # Lines read in one go share their arrival time
+    triggers = np.arange(2000)
+    trigger_ns = START_NS + triggers * 1_000_000
+    arrival_ns = (trigger_ns // 4_000_000 + 1) * 4_000_000
+    clock = TriggerClock(1000)
+    bounds = np.flatnonzero(np.diff(arrival_ns)) + 1
+    dejittered, indices = [], []
+    for part in np.split(arrival_ns, bounds):
+        t, k = clock.update_many(part)
+        dejittered += t
+        indices += k
+    assert np.array_equal(indices, triggers)
+    assert abs(clock.stats()['drift_ppm']) < 1
+    offset = np.array(dejittered[100:]) - trigger_ns[100:]
+    assert offset.max() - offset.min() < 100_000
+
+
+def stalled(splits, interval_ns=10_000_000, stall_at=2000, total=3000):
+    # The host doesn't read for a while; the backlog is then read in several batches
+    # that arrive almost at once, the first batch holding only the oldest lines
+    triggers = np.arange(total)
+    trigger_ns, arrival_ns = arrivals(triggers, interval_ns, latency_ns=100_000)
+    backlog = sum(splits)
+    read_ns = trigger_ns[stall_at + backlog - 1] + 300_000
+    batches = [arrival_ns[i:i + 1] for i in range(stall_at)]
+    start = stall_at
+    for n, split in enumerate(splits):
+        batches.append(np.full(split, read_ns + n * 100_000, dtype=np.int64))
+        start += split
+    batches += [arrival_ns[i:i + 1] for i in range(start, total)]
+    return triggers, batches
+
+
+def test_stalled_backlog_split_across_reads_is_not_a_gap():
+    for splits in ([5, 6], [8, 3], [5, 5, 1], [1, 10]):
+        triggers, batches = stalled(splits)
+        clock = TriggerClock(100)
+        indices = []
+        for batch in batches:
+            indices += clock.update_many(batch)[1]
+        assert np.array_equal(indices, triggers), splits
+        assert clock.stats()['skipped'] == 0
+
+
+def test_wrong_gap_is_rolled_back():
+    # Two slow reads in a row look like two lost lines until the next sample comes on time
+    triggers = np.arange(1000)
+    _, arrival_ns = arrivals(triggers, 10_000_000, latency_ns=100_000)
+    arrival_ns[500:502] += 20_000_000
+    clock = TriggerClock(100)
+    indices = clock.update_many(arrival_ns[:490])[1] + clock.update_many(arrival_ns[490:])[1]
+    assert np.array_equal(indices, triggers)
+    assert clock.stats()['skipped'] == 0
+    clock = TriggerClock(100)
+    _, indices = feed(clock, arrival_ns, 1)
+    assert np.array_equal(indices[502:], triggers[502:])
+    assert clock.stats()['skipped'] == 0
@@ -0,0 +1,86 @@
+import numpy as np
+from datetime import datetime, timedelta
+import pytest
+
+from session_file import RECORD_DTYPE
+from recorder import CSVBackend
+from analysis import load_session
+from convert_archive import convert_file, _convert
+
+
+def make_records(n):
+    records = np.zeros(n, dtype=RECORD_DTYPE)
+    records['counter'] = np.arange(1, n + 1)
+    records['timestamp_ns'] = 1_768_478_400_000_000_000 + np.arange(n) * 10_001_234
+    records['period_ms'] = np.concatenate(([0], np.diff(records['timestamp_ns']) / 1e6))
+    records['position'] = np.arange(n) * 3 + 100
+    return records
+
+
+@pytest.mark.parametrize('layout', ['cli', 'gui'])
+def test_conversion_verifies_against_the_csv_text(tmp_path, layout):
+    path = str(tmp_path / f'{layout}.csv')
+    backend = CSVBackend(path, {'freq': 100, 'start_time_ns': 1_768_478_400_000_000_000}, layout=layout)
+    backend.write(make_records(1000))
+    backend.close()
+    report = convert_file(path, chunk_records=256)
+    assert report.get('verified'), report
+    archive = load_session(report['output'])
+    source = load_session(path)
+    assert archive.tobytes() == source.tobytes()
+
+
+def test_lossy_conversions_are_rejected(tmp_path):
+    backend = CSVBackend(str(tmp_path / 'base.csv'), {'freq': 100}, layout='cli')
+    backend.write(make_records(20))
+    backend.close()
+    with open(tmp_path / 'base.csv') as f:
+        lines = f.read().splitlines()
+
+    cases = {
+        'extra_column': lines[:5] + [lines[5] + ',7'] + lines[6:],
+        'fractional_position': lines[:5] + [lines[5][:lines[5].rindex(',')] + ',115.5'] + lines[6:],
+        'short_row': lines[:5] + ['6,2026-01-15 12:00:00.050'] + lines[6:],
+    }
+    for name, content in cases.items():
+        path = tmp_path / f'{name}.csv'
+        path.write_text('\n'.join(content) + '\n')
+        report = convert_file(str(path))
+        assert not report['verified'], name
+        assert not (tmp_path / f'{name}.archive').exists()
+
+
+def test_empty_recording(tmp_path):
+    path = tmp_path / 'mouse_0115_1.csv'
+    path.write_text("Frame,Timestamp,Timestep,Position\n")
+    report = convert_file(str(path))
+    assert report['verified'] and report['records'] == 0
+    assert len(load_session(report['output'])) == 0
+
+
+def test_failed_conversion_leaves_no_archive(tmp_path):
+    backend = CSVBackend(str(tmp_path / 'serial_data_1.csv'), {'freq': 100}, layout='cli')
+    backend.write(make_records(1000))
+    backend.close()
+    with open(tmp_path / 'serial_data_1.csv') as f:
+        lines = f.read().splitlines()
+    lines[400] = lines[400][:lines[400].rindex(',')] + ',abc'
+    (tmp_path / 'serial_data_1.csv').write_text('\n'.join(lines) + '\n')
+    for _ in range(2):
+        report = _convert((str(tmp_path / 'serial_data_1.csv'), {'chunk_records': 256}))
+        assert 'error' in report and not report.get('skipped')
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['serial_data_1.csv']
+
+
+def test_gui_timestamps_without_fraction(tmp_path):
+    # The GUI wrote str(datetime.now()), which has no fraction when the microsecond is 0
+    start = datetime(2026, 1, 15, 11, 59, 59, 980000)
+    rows = ["Frame,Timestamp,Timestep,Position"]
+    for i in range(5):
+        rows.append(f"{i + 1},{start + timedelta(milliseconds=10 * i)},0.01,{100 + i}")
+    assert rows[3].split(',')[1] == '2026-01-15 12:00:00'
+    path = tmp_path / 'mouse_0115_1.csv'
+    path.write_text('\n'.join(rows) + '\n')
+    report = convert_file(str(path))
+    assert report['verified'], report
+    assert load_session(report['output']).tobytes() == load_session(str(path)).tobytes()
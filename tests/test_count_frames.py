@@ -0,0 +1,45 @@
+import os
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+pytest.importorskip('cv2')
+import count_frames
+from count_frames import count_frames_batch
+
+
+def test_cache_invalidation(tmp_path, monkeypatch):
+    # Count in threads so the fake counter sees every call; exact counts differ from container counts
+    calls = []
+
+    def fake_count(job):
+        path, exact = job
+        calls.append((os.path.basename(path), exact))
+        return 101 if exact else 100
+
+    monkeypatch.setattr(count_frames, '_count', fake_count)
+    monkeypatch.setattr(count_frames, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    videos = [tmp_path / 'a.avi', tmp_path / 'b.avi']
+    for video in videos:
+        video.write_bytes(b'x' * 10)
+    paths = [str(video) for video in videos]
+    cache = str(tmp_path / 'frame_counts.json')
+
+    def batch(exact=False):
+        calls.clear()
+        return set(count_frames_batch(paths, exact=exact, cache_path=cache).values())
+
+    assert batch() == {100}
+    assert sorted(calls) == [('a.avi', False), ('b.avi', False)]
+    # Unchanged files come from the cache
+    assert batch() == {100} and calls == []
+    # A changed size or modification time is counted again
+    videos[0].write_bytes(b'x' * 20)
+    stat = os.stat(videos[1])
+    os.utime(videos[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert batch() == {100}
+    assert sorted(calls) == [('a.avi', False), ('b.avi', False)]
+    # An exact count replaces a container count and also serves later container requests
+    assert batch(exact=True) == {101}
+    assert sorted(calls) == [('a.avi', True), ('b.avi', True)]
+    assert batch() == {101} and calls == []
+    assert batch(exact=True) == {101} and calls == []
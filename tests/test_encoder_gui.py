@@ -0,0 +1,35 @@
+import os
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+pytest.importorskip('PyQt6')
+from PyQt6.QtWidgets import QApplication
+
+from analysis import load_session
+from encoder_gui import AcquisitionWorker
+
+
+def test_worker_reports_port_errors_and_saves(tmp_path, fake_serial):
+    app = QApplication.instance() or QApplication([])
+    path = str(tmp_path / 'mouse_0115_1.csv')
+    ser = fake_serial(b"".join(f"{v}\r\n".encode() for v in range(100, 130)), fail_when_drained=True)
+    worker = AcquisitionWorker(ser, path, 100)
+    failures, metrics = [], []
+    worker.failed.connect(failures.append)
+    worker.metricsReady.connect(metrics.append)
+    worker.run()  # In this thread, so the signals arrive directly
+    assert failures == ["device disconnected"]
+    assert metrics and metrics[-1]['received'] == 30
+    assert load_session(path)['position'].tolist() == list(range(100, 130))
+    assert os.path.exists(str(tmp_path / 'mouse_0115_1_summary.json'))
+
+
+def test_plotted_positions_leave_out_the_trigger_count(tmp_path, fake_serial):
+    # A stationary wheel: the board prints pos + count with pos fixed at 100
+    app = QApplication.instance() or QApplication([])
+    ser = fake_serial(b"".join(f"{100 + count}\r\n".encode() for count in range(1, 51)), fail_when_drained=True)
+    worker = AcquisitionWorker(ser, str(tmp_path / 'mouse_0115_1.csv'), 100)
+    plotted = []
+    worker.samplesReady.connect(lambda times, positions: plotted.extend(positions.tolist()))
+    worker.run()
+    assert len(plotted) == 50 and set(plotted) == {101}
@@ -0,0 +1,81 @@
+import os
+import json
+import time
+import pytest
+import serial
+
+from analysis import load_session
+from encoder_reader import EncoderReader
+import multi_rig
+
+
+def lines(values):
+    return b"".join(f"{v}\r\n".encode() for v in values)
+
+
+def read_until_error(reader, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        reader.read(0.05)
+    raise AssertionError("the port error never surfaced")
+
+
+def test_port_error_still_saves_the_recording(tmp_path, fake_serial):
+    path = str(tmp_path / 'run.csv')
+    ser = fake_serial(lines(range(100, 150)), fail_when_drained=True)
+    reader = EncoderReader(freq=100, output=path, ser=ser, send_commands=False)
+    reader.start()
+    with pytest.raises(OSError):
+        read_until_error(reader)
+    with pytest.raises(OSError):
+        reader.stop()
+    assert reader.stop() is reader.summary  # Already stopped
+    records = load_session(path)
+    assert records['position'].tolist() == list(range(50))
+    with open(reader.summary_path()) as f:
+        assert json.load(f)['metrics']['received'] == 50
+
+
+def test_stop_without_reading_flushes_everything(tmp_path, fake_serial):
+    path = str(tmp_path / 'run.session')
+    ser = fake_serial(lines(range(1, 21)))
+    reader = EncoderReader(freq=100, output=path, ser=ser)
+    reader.start()
+    time.sleep(0.1)
+    summary = reader.stop()
+    assert summary['metrics']['received'] == 20
+    assert len(load_session(path)) == 20
+    assert ser.written.startswith(b"A 100\nS\n") and ser.written.endswith(b"E\n")
+    assert ser.is_open  # Not ours to close
+
+
+def test_multi_rig_stops_only_started_rigs(tmp_path, monkeypatch, fake_serial):
+    # The second port can't be opened: the first rig must be stopped and saved,
+    # and the real error must come out
+    ports = {'rig1': fake_serial(lines(range(1, 11)))}
+
+    def open_port(port_name, *args, **kwargs):
+        if port_name not in ports:
+            raise serial.SerialException(f"could not open port {port_name}")
+        return ports[port_name]
+
+    monkeypatch.setattr('encoder_reader.serial.Serial', open_port)
+    specs = [{'port': 'rig1', 'freq': 100, 'output': str(tmp_path / 'rig1.csv')},
+             {'port': 'rig2', 'freq': 100, 'output': str(tmp_path / 'rig2.csv')}]
+    with pytest.raises(serial.SerialException, match='rig2'):
+        multi_rig.record(specs)
+    assert not ports['rig1'].is_open
+    assert os.path.exists(tmp_path / 'rig1_summary.json')
+    assert not os.path.exists(tmp_path / 'rig2.csv')
+
+
+def test_multi_rig_stops_the_others_when_one_fails(tmp_path, monkeypatch, fake_serial):
+    ports = {'rig1': fake_serial(lines(range(1, 11)), fail_when_drained=True),
+             'rig2': fake_serial(lines(range(1, 11)))}
+    monkeypatch.setattr('encoder_reader.serial.Serial', lambda port_name, *args, **kwargs: ports[port_name])
+    specs = [{'port': name, 'freq': 100, 'output': str(tmp_path / f'{name}.csv')} for name in ports]
+    with pytest.raises(OSError):
+        multi_rig.record(specs, timer=5)
+    assert not ports['rig1'].is_open and not ports['rig2'].is_open
+    assert len(load_session(str(tmp_path / 'rig1.csv'))) == 10
+    assert len(load_session(str(tmp_path / 'rig2.csv'))) == 10
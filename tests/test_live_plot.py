@@ -0,0 +1,37 @@
+import os
+import numpy as np
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+pytest.importorskip('PyQt6')
+from PyQt6.QtWidgets import QApplication
+
+from live_plot import HistoryBuffer, LivePlot, history_capacity
+
+
+def test_history_wraps_around():
+    history = HistoryBuffer(8)
+    history.extend(np.arange(5) * 1000, np.arange(5))
+    history.extend(np.arange(5, 12) * 1000, np.arange(5, 12))
+    times, positions, velocities = history.latest()
+    assert positions.tolist() == list(range(4, 12))
+    assert np.all(velocities == 1e6)
+
+
+def test_capacity_covers_the_window():
+    assert history_capacity(None, 10) == 65536
+    assert history_capacity(1000, 10) == 65536
+    assert history_capacity(20000, 10) >= 200000
+
+
+def test_clear_resizes_for_the_rate():
+    app = QApplication.instance() or QApplication([])
+    plot = LivePlot(window_s=10)
+    plot.clear(20000)
+    interval_ns = 50_000
+    times = np.arange(200001) * interval_ns
+    plot.addSamples(times, np.arange(len(times)))
+    shown, _, _ = plot.history.latest()
+    assert shown[-1] - shown[0] >= plot.window_ns
+    plot.clear(100)
+    assert plot.history.capacity == 65536 and plot.history.index == 0
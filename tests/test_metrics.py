@@ -0,0 +1,35 @@
+import numpy as np
+
+from clock_sync import TriggerClock
+from metrics import AcquisitionMetrics, format_snapshot
+
+
+def test_fitted_interval_keeps_drift_out_of_missing():
+    # The board runs 100 ppm slow: by the nominal interval 30000 samples look like 30003
+    interval_ns = 10_000_000 * (1 + 100e-6)
+    arrivals = (1_000_000_000_000 + np.arange(30000) * interval_ns).astype(np.int64)
+    nominal = AcquisitionMetrics(100)
+    clock = TriggerClock(100)
+    fitted = AcquisitionMetrics(100, clock=clock)
+    for start in range(0, len(arrivals), 100):
+        chunk = arrivals[start:start + 100]
+        nominal.add_batch(chunk)
+        fitted.add_batch(chunk)
+        clock.update_many(chunk)
+    assert nominal.snapshot()['missing'] == 3
+    snapshot = fitted.snapshot()
+    assert snapshot['expected'] == 30000
+    assert snapshot['missing'] == 0
+
+
+def test_detected_drops_are_reported():
+    triggers = np.delete(np.arange(5000), [1000, 3000])
+    arrivals = 1_000_000_000_000 + triggers * 10_000_000 + 100_000
+    clock = TriggerClock(100)
+    metrics = AcquisitionMetrics(100, clock=clock)
+    metrics.add_batch(arrivals)
+    clock.update_many(arrivals)
+    snapshot = metrics.snapshot()
+    assert snapshot['missing'] == 2
+    assert snapshot['detected_drops'] == 2
+    assert "2 dropped lines detected" in format_snapshot(snapshot)
@@ -0,0 +1,64 @@
+import os
+import time
+import numpy as np
+
+from publisher import ShmPublisher, ShmSubscriber, make_samples
+from encoder_reader import EncoderReader
+
+
+def ring_name():
+    return f"encoder_test_{os.getpid()}_{time.monotonic_ns()}"
+
+
+def samples(counters):
+    counters = np.asarray(counters, dtype=np.int64)
+    return make_samples(counters, counters * 10, counters * 10, counters)
+
+
+def test_receive_times_out():
+    name = ring_name()
+    publisher = ShmPublisher(name, capacity=16)
+    subscriber = ShmSubscriber(name)
+    try:
+        start = time.monotonic()
+        assert len(subscriber.receive(timeout=0.05)) == 0
+        assert time.monotonic() - start < 1
+        publisher.publish(samples([1, 2, 3]))
+        assert subscriber.receive(timeout=0.05)['counter'].tolist() == [1, 2, 3]
+    finally:
+        subscriber.close()
+        publisher.close()
+
+
+def test_subscriber_overrun():
+    name = ring_name()
+    publisher = ShmPublisher(name, capacity=8)
+    subscriber = ShmSubscriber(name)
+    try:
+        publisher.publish(samples(range(1, 13)))
+        received = subscriber.receive(timeout=0.05)
+        assert received['counter'].tolist() == list(range(5, 13))
+        assert subscriber.overruns == 4
+    finally:
+        subscriber.close()
+        publisher.close()
+
+
+def test_published_positions_are_relative_to_the_first_sample(fake_serial):
+    # SerialApp records the raw pos + count, consumers get the wheel relative to the start
+    name = ring_name()
+    ser = fake_serial(b"".join(f"{500 + 3 * i}\r\n".encode() for i in range(10)))
+    reader = EncoderReader(freq=100, ser=ser, offset_positions=False, publish=f"shm://{name}", send_commands=False)
+    reader.start()
+    subscriber = ShmSubscriber(name)
+    try:
+        deadline = time.monotonic() + 5
+        chunks = []
+        while sum(len(c) for c in chunks) < 10 and time.monotonic() < deadline:
+            chunks.append(reader.read(0.05))
+        recorded = np.concatenate(chunks)
+        assert recorded['position'].tolist() == list(range(500, 530, 3))
+        assert subscriber.receive(timeout=1)['position'].tolist() == list(range(0, 20, 2))
+    finally:
+        subscriber.close()
+        reader.stop()
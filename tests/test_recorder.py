@@ -0,0 +1,34 @@
+import time
+import numpy as np
+
+from session_file import RECORD_DTYPE
+from recorder import format_timestamps, NpyBackend
+
+
+def test_format_timestamps_millis():
+    t = np.datetime64('2026-01-15T12:00:00.123456789', 'ns').astype(np.int64)
+    assert format_timestamps([t], digits=6) == ['2026-01-15 ' + time.strftime('%H:%M:%S', time.localtime(t // 10**9)) + '.123456']
+
+
+def test_format_timestamps_across_dst_change(berlin_time):
+    # Clocks went forward at 01:00 UTC on 2026-03-29
+    change = np.datetime64('2026-03-29T01:00:00', 'ns').astype(np.int64)
+    stamps = np.array([change - 500_000_000, change + 500_000_000], dtype=np.int64)
+    assert format_timestamps(stamps, digits=3) == ['2026-03-29 01:59:59.500', '2026-03-29 03:00:00.500']
+
+
+def test_format_timestamps_empty():
+    assert format_timestamps(np.empty(0, dtype=np.int64)) == []
+
+
+def test_npy_is_readable_after_a_crash(tmp_path):
+    path = str(tmp_path / 'run.npy')
+    backend = NpyBackend(path)
+    records = np.zeros(10, dtype=RECORD_DTYPE)
+    records['counter'] = np.arange(1, 11)
+    backend.write(records[:6])
+    backend.flush()
+    backend.write(records[6:])  # Not flushed when the process dies
+    assert np.load(path)['counter'].tolist() == list(range(1, 7))
+    backend.close()
+    assert np.load(path)['counter'].tolist() == list(range(1, 11))
@@ -0,0 +1,81 @@
+import time
+import numpy as np
+
+from serial_reader import RingBuffer, SerialReaderThread
+
+
+def test_pop_all_returns_records_in_order_across_wraparound():
+    buffer = RingBuffer(capacity=8)
+    buffer.push_many(1, np.arange(6))
+    buffer.pop_all()
+    buffer.push_many(2, np.arange(6, 12))
+    times, positions = buffer.pop_all()
+    assert positions.tolist() == list(range(6, 12))
+    assert times.tolist() == [2] * 6
+    assert buffer.overruns == 0
+
+
+def test_pop_all_counts_overruns_when_lapped():
+    buffer = RingBuffer(capacity=8)
+    buffer.push_many(1, np.arange(20))
+    times, positions = buffer.pop_all()
+    assert positions.tolist() == list(range(12, 20))
+    assert buffer.overruns == 12
+
+
+def test_pop_all_keeps_a_full_buffer_when_nothing_is_in_flight():
+    buffer = RingBuffer(capacity=8)
+    buffer.push_many(1, np.arange(8))
+    _, positions = buffer.pop_all()
+    assert positions.tolist() == list(range(8))
+    assert buffer.overruns == 0
+
+
+def test_pop_all_drops_slots_the_producer_is_still_writing():
+    buffer = RingBuffer(capacity=8)
+    buffer.push_many(1, np.arange(8))
+    # The producer has claimed two more slots (overwriting the two oldest records)
+    # but not yet published them
+    buffer.claim_index = buffer.write_index + 2
+    _, positions = buffer.pop_all()
+    assert positions.tolist() == list(range(2, 8))
+    assert buffer.overruns == 2
+
+
+def test_pop_all_empty():
+    times, positions = RingBuffer(capacity=4).pop_all()
+    assert len(times) == 0 and len(positions) == 0
+
+
+def test_handle_chunk_splits_lines_and_counts_parse_errors():
+    buffer = RingBuffer(capacity=16)
+    reader = SerialReaderThread(None, buffer)
+    reader.handle_chunk(b'101\r\n10', 5)
+    reader.handle_chunk(b'2\r\n?x\r\n\r\n103\r\n', 6)
+    times, positions = buffer.pop_all()
+    assert positions.tolist() == [101, 102, 103]
+    assert times.tolist() == [5, 6, 6]
+    assert reader.parse_errors == 1
+
+
+def test_high_water_counts_the_backlog_behind_a_blocking_read(fake_serial):
+    class QuietAtFirst(fake_serial):
+        # Reports an empty port once, so the reader blocks on read(1) and finds the rest behind it
+        checked = False
+
+        @property
+        def in_waiting(self):
+            if not self.checked:
+                self.checked = True
+                return 0
+            return len(self.data)
+
+    ser = QuietAtFirst(b"101\r\n102\r\n103\r\n")
+    reader = SerialReaderThread(ser, RingBuffer(capacity=16))
+    reader.start()
+    deadline = time.monotonic() + 5
+    while reader.bytes_read < 15 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    reader.stop()
+    reader.join()
+    assert reader.in_waiting_high_water == 14
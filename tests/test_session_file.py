@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from session_file import RECORD_DTYPE, HEADER_SIZE, SessionWriter, SessionReader
+
+START_NS = 1_768_478_400_000_000_000
+
+
+def write_session(path, n, freq=100):
+    records = np.zeros(n, dtype=RECORD_DTYPE)
+    records['counter'] = np.arange(1, n + 1)
+    records['timestamp_ns'] = START_NS + np.arange(n) * 10_000_000
+    records['period_ms'] = 10.0
+    records['position'] = np.arange(n) * 3
+    writer = SessionWriter(str(path), {'freq': freq, 'start_time_ns': START_NS, 'port': '/dev/ttyACM0'})
+    writer.write(records)
+    writer.close()
+    return records
+
+
+def test_round_trip(tmp_path):
+    records = write_session(tmp_path / 'run.session', 50)
+    with SessionReader(str(tmp_path / 'run.session')) as session:
+        assert session.freq == 100 and session.start_time_ns == START_NS and session.port == '/dev/ttyACM0'
+        assert len(session) == 50 and session.truncated_bytes == 0
+        assert np.array_equal(np.asarray(session.records), records)
+        assert session.position.tolist() == records['position'].tolist()
+
+
+def test_truncated_last_record_is_ignored(tmp_path):
+    path = tmp_path / 'run.session'
+    write_session(path, 10)
+    with open(path, 'r+b') as f:
+        f.truncate(HEADER_SIZE + 9 * RECORD_DTYPE.itemsize + 5)
+    with SessionReader(str(path)) as session:
+        assert len(session) == 9 and session.truncated_bytes == 5
+        assert session.counter.tolist() == list(range(1, 10))
+
+
+def test_between_seconds(tmp_path):
+    write_session(tmp_path / 'run.session', 100)
+    with SessionReader(str(tmp_path / 'run.session')) as session:
+        part = session.between_seconds(0.1, 0.25)
+        assert part['counter'].tolist() == list(range(11, 26))
+        assert len(session.between_seconds(2, 3)) == 0
+
+
+def test_header_is_validated(tmp_path):
+    write_session(tmp_path / 'run.session', 3)
+    data = (tmp_path / 'run.session').read_bytes()
+    cases = {
+        'empty': b'',
+        'short': data[:40],
+        'magic': b'NOTASESS' + data[8:],
+        'version': data[:8] + (7).to_bytes(4, 'little') + data[12:],
+        'header_size': data[:12] + (1 << 20).to_bytes(4, 'little') + data[16:],
+    }
+    for name, content in cases.items():
+        path = tmp_path / f'{name}.session'
+        path.write_bytes(content)
+        with pytest.raises(ValueError):
+            SessionReader(str(path))
@@ -0,0 +1,55 @@
+import json
+import numpy as np
+
+from session_file import RECORD_DTYPE
+from recorder import CSVBackend
+from summarize_sessions import find_runs, summarize_runs
+
+
+def write_run(path, moves):
+    # Raw pos + count values, as SerialApp records them
+    n = len(moves)
+    records = np.zeros(n, dtype=RECORD_DTYPE)
+    records['counter'] = np.arange(1, n + 1)
+    records['timestamp_ns'] = 1_768_478_400_000_000_000 + np.arange(n) * 10_000_000
+    records['period_ms'] = 10.0
+    records['position'] = 1000 + np.cumsum(moves) + records['counter']
+    backend = CSVBackend(str(path), layout='gui')
+    backend.write(records)
+    backend.close()
+
+
+def test_find_runs(tmp_path):
+    for name in ['mouse_A_0115_1.csv', 'm2_0115_2.csv', 'm2_0115_2_bouts.csv', 'serial_data_2026_01_15.csv', 'notes.csv']:
+        (tmp_path / name).write_text('')
+    runs, unmatched = find_runs([str(tmp_path)])
+    assert [run[:3] for run in runs] == [('m2', '0115', '2'), ('mouse_A', '0115', '1')]
+    assert unmatched == [str(tmp_path / 'notes.csv')]
+
+
+def test_summarize_runs_with_cache(tmp_path, capsys):
+    write_run(tmp_path / 'm1_0115_1.csv', np.zeros(100, dtype=np.int64))
+    write_run(tmp_path / 'm1_0115_2.csv', np.full(100, 2))
+    (tmp_path / 'm1_0115_3.csv').write_text('not a recording\n')
+    cache = str(tmp_path / 'cache.json')
+    runs, _ = find_runs([str(tmp_path)])
+    results, computed = summarize_runs(runs, cache, workers=2)
+    assert computed == 3
+    summaries = {run[2]: summary for run, summary in results}
+    assert summaries['1']['distance'] == 0 and summaries['1']['peak_speed'] == 0
+    assert summaries['2']['distance'] == 198
+    assert summaries['3'] is None
+    assert "m1_0115_3.csv: ERROR" in capsys.readouterr().out
+    _, computed = summarize_runs(runs, cache, workers=2)
+    assert computed == 1  # Only the failed file is tried again
+
+
+def test_jitter_comes_from_the_timing_summary(tmp_path):
+    write_run(tmp_path / 'm1_0115_1.csv', np.zeros(100, dtype=np.int64))
+    cache = str(tmp_path / 'cache.json')
+    runs, _ = find_runs([str(tmp_path)])
+    (_, summary), = summarize_runs(runs, cache, workers=1)[0]
+    assert summary['jitter_ms'] == 0  # Evenly spaced recorded times
+    (tmp_path / 'm1_0115_1_summary.json').write_text(json.dumps({'timing': {'jitter_std_ms': 0.25}}))
+    results, computed = summarize_runs(runs, cache, workers=1)
+    assert computed == 1 and results[0][1]['jitter_ms'] == 0.25